@@ -7,7 +7,28 @@ project: LuigiPyTools
 date: 5/21/2020
 author: lmaio
 """
-from LuigiPyTools.google_api import GoogleSheets, GoogleCalendar
-from LuigiPyTools.latex_pd import LatexPandas
+import importlib
 
-__all__ = ['GoogleSheets', 'GoogleCalendar', 'LatexPandas']
\ No newline at end of file
+# Public classes and their modules. Modules are imported on first access, so that
+# ie. LatexPandas can be used without importing the Google api clients.
+_LAZY_IMPORTS = {'GoogleSheets': 'LuigiPyTools.google_api',
+                 'GoogleCalendar': 'LuigiPyTools.google_api',
+                 'LatexPandas': 'LuigiPyTools.latex_pd',
+                 'CellFormats': 'LuigiPyTools.cell_formats',
+                 'AsyncGoogleSheets': 'LuigiPyTools.google_async',
+                 'AsyncGoogleCalendar': 'LuigiPyTools.google_async',
+                 'Profiler': 'LuigiPyTools.metrics'}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value  # Later lookups bypass __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
\ No newline at end of file
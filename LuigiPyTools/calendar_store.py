@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: calendar_store
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+import json
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, timezone
+
+
+class CalendarStore():
+    '''
+    Description
+    -----------
+    Local SQLite store of calendar events and their sync tokens, used by
+    GoogleCalendar.sync_calendar for incremental synchronization.
+
+    '''
+    def __init__(self, store_dir):
+        '''
+
+        Parameters
+        ----------
+        store_dir: str
+            Directory of the database file. Created if it does not exist.
+        '''
+        if not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+        self.db_file = os.path.join(store_dir, 'calendar_events.sqlite')
+
+        with closing(self._connect()) as con, con:
+            con.execute('CREATE TABLE IF NOT EXISTS events (cal_id TEXT, id TEXT, start TEXT, end TEXT, '
+                        'data TEXT, PRIMARY KEY (cal_id, id))')
+            con.execute('CREATE INDEX IF NOT EXISTS events_start ON events (cal_id, start)')
+            con.execute('CREATE TABLE IF NOT EXISTS sync (cal_id TEXT PRIMARY KEY, token TEXT)')
+
+    def _connect(self):
+        # New connection per operation, so the store can be shared between threads
+        return sqlite3.connect(self.db_file, timeout=30)
+
+    @staticmethod
+    def _utc(t):
+        '''Normalizes a calendar event time or RFC3339 timestamp to a sortable UTC string'''
+        if isinstance(t, dict):
+            t = t.get('dateTime') or t.get('date')
+        if t is None:
+            return None
+        if isinstance(t, str):
+            t = datetime.fromisoformat(t.replace('Z', '+00:00'))
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=timezone.utc)  # All-day events and naive times are taken as UTC
+        return t.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def sync_token(self, cal_id):
+        '''Stored sync token of cal_id, None if the calendar was never synced'''
+        with closing(self._connect()) as con:
+            row = con.execute('SELECT token FROM sync WHERE cal_id = ?', (cal_id,)).fetchone()
+        return row[0] if row else None
+
+    def apply(self, cal_id, events, sync_token, full=False):
+        '''Stores changed events and the new sync token in a single transaction.
+        Cancelled events are removed.
+
+        Parameters
+        ----------
+        cal_id: str
+            Google calendar id
+        events: iterable of dict
+            Changed events, as returned by events().list
+        sync_token: str
+            nextSyncToken of the last page
+        full: bool, default False
+            Replace all stored events of cal_id, ie. for a full sync
+
+        Returns
+        -------
+        int, number of changed events
+        '''
+        n_changes = 0
+        with closing(self._connect()) as con, con:
+            if full:
+                con.execute('DELETE FROM events WHERE cal_id = ?', (cal_id,))
+            for event in events:
+                n_changes += 1
+                if event.get('status') == 'cancelled':
+                    con.execute('DELETE FROM events WHERE cal_id = ? AND id = ?', (cal_id, event['id']))
+                    continue
+                con.execute('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)',
+                            (cal_id, event['id'], self._utc(event.get('start')), self._utc(event.get('end')),
+                             json.dumps(event)))
+            con.execute('INSERT OR REPLACE INTO sync VALUES (?, ?)', (cal_id, sync_token))
+
+        return n_changes
+
+    def clear(self, cal_id):
+        '''Removes all stored events and the sync token of cal_id'''
+        with closing(self._connect()) as con, con:
+            con.execute('DELETE FROM events WHERE cal_id = ?', (cal_id,))
+            con.execute('DELETE FROM sync WHERE cal_id = ?', (cal_id,))
+
+    def events(self, cal_id, start=None, end=None) -> list:
+        '''Stored events of cal_id overlapping [start, end), ordered by start time
+
+        Parameters
+        ----------
+        cal_id: str
+            Google calendar id
+        start: str or datetime, optional
+            RFC3339 timestamp, eg. datetime.utcnow().isoformat() + 'Z'
+        end: str or datetime, optional
+            Same format as 'start'
+
+        Returns
+        -------
+        List of dictionaries
+        '''
+        query = 'SELECT data FROM events WHERE cal_id = ?'
+        params = [cal_id]
+        if start is not None:
+            query += ' AND end > ?'
+            params.append(self._utc(start))
+        if end is not None:
+            query += ' AND start < ?'
+            params.append(self._utc(end))
+        query += ' ORDER BY start'
+
+        with closing(self._connect()) as con:
+            rows = con.execute(query, params).fetchall()
+        return [json.loads(data) for data, in rows]
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: cassette
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+import base64
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+class Cassette():
+    '''
+    Description
+    -----------
+    Record and replay of the http traffic of GoogleService. In 'record' mode the
+    responses of the Google APIs are stored in cassette_dir, one JSON file per request.
+    In 'replay' mode they are served from there without network or credentials,
+    optionally with injected latency and errors. 'passthrough' leaves the transport
+    untouched.
+
+    Repeated identical requests are replayed in the recorded order, the last response
+    is repeated once they run out.
+
+    '''
+    MODES = ('passthrough', 'record', 'replay')
+
+    def __init__(self, cassette_dir, mode='replay', latency=0., error_rate=0., error_status=503, seed=None):
+        '''
+
+        Parameters
+        ----------
+        cassette_dir: str
+            Directory of the recorded responses. Created if it does not exist.
+        mode: str, default 'replay'
+            'passthrough', 'record' or 'replay'
+        latency: float, default 0
+            Delay of every replayed response, in seconds
+        error_rate: float, default 0
+            Fraction of replayed requests failing with error_status
+        error_status: int, default 503
+            Status of the injected errors. Quota (429) and server errors are retried
+            by GoogleService
+        seed: int, optional
+            Seed of the injected errors, for reproducible runs
+        '''
+        if mode not in self.MODES:
+            raise ValueError(f'Cassette mode must be one of {self.MODES}')
+        if not os.path.exists(cassette_dir):
+            os.makedirs(cassette_dir)
+        self.cassette_dir = cassette_dir
+        self.mode = mode
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recorded = set()  # Keys recorded in this session, older recordings are replaced
+        self._positions = {}
+
+    @staticmethod
+    def _key(method, uri, body):
+        if isinstance(body, str):
+            body = body.encode()
+        return hashlib.sha1(b'\n'.join([method.encode(), uri.encode(), body or b''])).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cassette_dir, key + '.json')
+
+    def wrap(self, http):
+        '''Transport of the cassette mode, wrapping http'''
+        if self.mode == 'record':
+            return RecordHttp(http, self)
+        if self.mode == 'replay':
+            return ReplayHttp(self)
+        return http
+
+    def record(self, method, uri, body, resp, content):
+        '''Stores a response, see httplib2.Http.request'''
+        try:
+            response = {'headers': dict(resp), 'body': content.decode('utf-8')}
+        except UnicodeDecodeError:
+            response = {'headers': dict(resp), 'body': base64.b64encode(content).decode(), 'encoding': 'base64'}
+        response['headers']['status'] = str(resp.status)
+
+        key = self._key(method, uri, body)
+        with self._lock:
+            interaction = {'method': method, 'uri': uri, 'responses': []}
+            if key in self._recorded:
+                with open(self._path(key)) as f:
+                    interaction = json.load(f)
+            interaction['responses'].append(response)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.cassette_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(interaction, f, indent=1)
+            os.replace(tmp_path, self._path(key))
+            self._recorded.add(key)
+
+    def replay(self, method, uri, body):
+        '''Recorded response of a request, as (httplib2.Response, bytes)'''
+        import httplib2
+
+        key = self._key(method, uri, body)
+        with self._lock:
+            fail = self.error_rate and self._random.random() < self.error_rate
+            if not fail:
+                try:
+                    with open(self._path(key)) as f:
+                        responses = json.load(f)['responses']
+                except FileNotFoundError:
+                    raise LookupError(f'No recorded response for {method} {uri}') from None
+                position = self._positions.get(key, 0)
+                self._positions[key] = position + 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            content = json.dumps({'error': {'code': self.error_status, 'message': 'Injected error'}}).encode()
+            return httplib2.Response({'status': str(self.error_status), 'content-type': 'application/json'}), content
+
+        response = responses[min(position, len(responses) - 1)]
+        content = response['body'].encode('utf-8')
+        if response.get('encoding') == 'base64':
+            content = base64.b64decode(content)
+        return httplib2.Response(response['headers']), content
+
+    def rewind(self):
+        '''Replays all requests from their first recorded response again'''
+        with self._lock:
+            self._positions.clear()
+
+
+class RecordHttp():
+    '''
+    Description
+    -----------
+    Wraps an httplib2 compatible http object, storing its responses in a Cassette
+
+    '''
+    def __init__(self, http, cassette):
+        self.http = http
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+        self.cassette.record(method, uri, body, resp, content)
+        return resp, content
+
+
+class ReplayHttp():
+    '''
+    Description
+    -----------
+    httplib2 compatible http object serving the responses of a Cassette
+
+    '''
+    def __init__(self, cassette):
+        self.cassette = cassette
+        self.credentials = ReplayCredentials()
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        return self.cassette.replay(method, uri, body)
+
+
+class ReplayCredentials():
+    '''Always valid stand-in credentials for replayed requests'''
+    valid = True
+    expired = False
+    token = 'replay'
+
+    def apply(self, headers, token=None):
+        headers['authorization'] = 'Bearer replay'
+
+    def before_request(self, request, method, url, headers):
+        self.apply(headers)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: cell_formats
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+import numpy as np
+
+
+class CellFormats():
+    '''
+    Description
+    -----------
+    Compact formatting of a spreadsheet range. Format properties are stored in
+    arrays with one entry per unique format, cells refer to these by an integer code.
+    Memory therefore scales with the number of unique formats, not with the cells.
+
+    '''
+    ALIGNMENTS = ('', 'LEFT', 'CENTER', 'RIGHT')  # h_align enum, 0 is unspecified
+
+    def __init__(self, codes, background, h_align, bold, italic, font_size, col_widths=None):
+        '''
+
+        Parameters
+        ----------
+        codes: array of int, shape (rows, columns)
+            Format code of each cell
+        background: array of float, shape (formats, 3)
+            Background RGB, values between 0 and 1
+        h_align: array of int, shape (formats,)
+            Horizontal alignment, index of CellFormats.ALIGNMENTS
+        bold: array of bool, shape (formats,)
+        italic: array of bool, shape (formats,)
+        font_size: array of float, shape (formats,)
+        col_widths: list of int, optional
+            Column widths in pixels
+        '''
+        self.codes = np.asarray(codes, dtype=np.int32)
+        self.background = np.asarray(background, dtype=np.float64).reshape(-1, 3)
+        self.h_align = np.asarray(h_align, dtype=np.int8)
+        self.bold = np.asarray(bold, dtype=bool)
+        self.italic = np.asarray(italic, dtype=bool)
+        self.font_size = np.asarray(font_size, dtype=np.float32)
+        self.col_widths = None if col_widths is None else list(col_widths)
+
+    @classmethod
+    def from_formats(cls, codes, formats, col_widths=None):
+        '''Build from Google Sheets effectiveFormat dicts
+
+        Parameters
+        ----------
+        codes: array of int, shape (rows, columns)
+            Index of each cell's format in formats
+        formats: list of dict
+            Unique cell formats, see CellFormat in the Sheets API documentation
+        col_widths: list of int, optional
+            Column widths in pixels
+        '''
+        align_codes = {name: i for i, name in enumerate(cls.ALIGNMENTS) if name}
+
+        background, h_align, bold, italic, font_size = [], [], [], [], []
+        for fmt in formats:
+            # The API omits colour components equal to 0, and the colour if unset (white)
+            color = fmt.get('backgroundColor', {'red': 1, 'green': 1, 'blue': 1})
+            text = fmt.get('textFormat', {})
+            background.append([color.get('red', 0), color.get('green', 0), color.get('blue', 0)])
+            h_align.append(align_codes.get(fmt.get('horizontalAlignment'), 0))
+            bold.append(text.get('bold', False))
+            italic.append(text.get('italic', False))
+            font_size.append(text.get('fontSize', np.nan))
+
+        return cls(codes, background, h_align, bold, italic, font_size, col_widths=col_widths)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def rows(self, start=None, stop=None):
+        '''CellFormats of a subset of rows, sharing the format arrays'''
+        return CellFormats(self.codes[start:stop], self.background, self.h_align, self.bold,
+                           self.italic, self.font_size, col_widths=self.col_widths)
+
+    def cell_background(self):
+        '''Background RGB per cell, shape (rows, columns, 3)'''
+        return self.background[self.codes]
+
+    def cell_alignment(self):
+        '''Horizontal alignment code per cell, shape (rows, columns)'''
+        return self.h_align[self.codes]
@@ -17,19 +17,40 @@ TODO:
 import json
 import os
 import os.path
-import pickle
+import re
+import threading
+import time
 import warnings
 import inspect
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from LuigiPyTools import metrics
+from LuigiPyTools.calendar_store import CalendarStore
+from LuigiPyTools.cell_formats import CellFormats
+from LuigiPyTools.sheet_cache import SheetCache
+from LuigiPyTools.token_store import TokenStore
+from LuigiPyTools.transport import RetryHttp, TokenBucket
+
+
+# Process-wide credential/service cache, shared by instances created with share_cache=True
+_SHARED_CACHE = {}
+_SHARED_CACHE_LOCK = threading.Lock()
+
+
+def build(*args, **kwargs):
+    '''googleapiclient.discovery.build, imported on first use as it is slow to import'''
+    from googleapiclient.discovery import build
+    return build(*args, **kwargs)
 
 
 class GoogleService():
-    def __init__(self, SCOPES, api_credentials, auth_dir=None):
+    def __init__(self, SCOPES, api_credentials, auth_dir=None, share_cache=False, timeout=60, retries=5,
+                 rate_limit=None, cassette=None):
         '''
 
         Parameters
@@ -42,10 +63,27 @@ class GoogleService():
         auth_dir: str, default './auth'
             Filepath to directory where authentication tokens should be stored.
             Directory should be included in .gitignore
+        share_cache: bool, default False
+            Share credentials and built service objects with all other instances
+            in this process using the same credentials file, scopes and auth_dir.
+            Otherwise they are cached per instance.
+        timeout: float, default 60
+            Socket timeout of requests, in seconds
+        retries: int, default 5
+            Number of retries of requests failing with a quota (429) or server error,
+            with exponential backoff honouring the Retry-After header
+        rate_limit: float, optional
+            Maximum number of requests per second made by this instance
+        cassette: Cassette, optional
+            Records the api responses, or replays them without network or credentials.
+            See LuigiPyTools.cassette
         '''
-        # Directory of script which is creating this object. Must run here in __init__
-        frame = inspect.stack()[2]
-        module = inspect.getmodule(frame[0])
+        # Directory of script which is creating this object. Must run here in __init__,
+        # skipping the __init__ methods of subclasses
+        frame = inspect.currentframe().f_back
+        while frame.f_code.co_name == '__init__' and frame.f_locals.get('self') is self:
+            frame = frame.f_back
+        module = inspect.getmodule(frame)
         self.__call_module_dir = os.path.dirname(module.__file__)
         if not auth_dir:
             self._auth_dir = os.path.join(self.__call_module_dir, 'auth')
@@ -57,6 +95,15 @@ class GoogleService():
         self.__creds_file = api_credentials
         self._scope_type()
 
+        self._share_cache = share_cache
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+        self._timeout = timeout
+        self._retries = retries
+        self._rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        self._cassette = cassette
+
     def _create_auth_dir(self):
         '''Create directory for storing tokens and authentication'''
         if not os.path.exists(self._auth_dir):
@@ -71,49 +118,143 @@ class GoogleService():
                 self.scope_types.append('sheets')
             if 'calendar' in scope:
                 self.scope_types.append('calendar')
+            if 'drive' in scope:
+                self.scope_types.append('drive')
+
+    def _cache_key(self):
+        '''Key identifying the cached credentials. Changes when the scopes or the
+        credentials file (path or modification time) change.'''
+        creds_path = os.path.abspath(self.__creds_file)
+        return (creds_path, os.path.getmtime(creds_path),
+                tuple(sorted(self._scopes)), os.path.abspath(self._auth_dir))
+
+    def clear_cache(self):
+        '''Drop cached credentials and service objects of this instance, and its
+        entry in the process-wide cache if share_cache is enabled. Credentials are
+        reloaded from the token file.'''
+        with self._cache_lock:
+            self._cache.clear()
+        self._token_store().clear()
+        if self._share_cache:
+            with _SHARED_CACHE_LOCK:
+                _SHARED_CACHE.pop(self._cache_key(), None)
+
+    def _load_credentials(self, creds=None):
+        '''Returns valid credentials. Refreshes given creds if expired, otherwise
+        loads token from auth_dir or runs the authorization flow.
+
+        Parameters
+        ----------
+        creds: google.oauth2.credentials.Credentials, optional
+            Previously loaded credentials
+        '''
+        if self._cassette is not None and self._cassette.mode == 'replay':
+            from LuigiPyTools.cassette import ReplayCredentials
+            return ReplayCredentials()
+
+        # The file token.json stores the user's access and refresh tokens, and is
+        # created automatically when the authorization flow completes for the first
+        # time. Tokens of the provided creds file's client only.
+        with open(self.__creds_file, 'r') as f:
+            client_id = json.load(f)['installed']['client_id']
+        return self._token_store().credentials(self._authorize, client_id=client_id, creds=creds,
+                                               scopes=self._scopes)
+
+    def _token_store(self):
+        '''Token store of auth_dir, shared with all instances of this process'''
+        return TokenStore.open(os.path.join(self._auth_dir, 'token.json'),
+                               legacy_path=os.path.join(self._auth_dir, 'token.pickle'))
+
+    def _authorize(self):
+        '''Lets the user log in, returns new credentials'''
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file(self.__creds_file, self._scopes)
+        return flow.run_local_server(port=0)
 
     def _service_connect(self, type):
         '''Connects to appropriate google api service
 
+        Credentials and built services are cached, see share_cache. Credentials
+        are only refreshed once the token has expired; services are rebuilt only
+        when the credentials are replaced. Services are cached per thread, each
+        keeping its connections alive.
+
         Parameters
         ----------
         type: str
-            'calendar' or 'sheets'
+            'calendar', 'sheets' or 'drive'
         '''
-        creds = None
-        # The file token.pickle stores the user's access and refresh tokens, and is
-        # created automatically when the authorization flow completes for the first
-        # time.
-        token_file = os.path.join(self._auth_dir, 'token.pickle')
-        if os.path.exists(token_file):
-            with open(token_file, 'rb') as token:
-                creds = pickle.load(token)
-            # Check if loaded creds matches provided creds file
-            with open(self.__creds_file, 'r') as f:
-                prov_creds = json.load(f)
-            if prov_creds['installed']['client_id'] != creds._client_id:
-                creds = None
-        # If there are no (valid) credentials available, let the user log in.
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.__creds_file, self._scopes)
-                creds = flow.run_local_server(port=0)
-            # Save the credentials for the next run
-            with open(token_file, 'wb') as token:
-                pickle.dump(creds, token)
-
-        if type == 'sheets':
-            service = build('sheets', 'v4', credentials=creds)
-        elif type == 'calendar':
-            service = build('calendar', 'v3', credentials=creds)
-        else:
+        if type not in ('sheets', 'calendar', 'drive'):
             raise KeyError("Scope type not recognised")
 
+        entry, lock = self._cache_entry()
+        with lock:
+            creds = self._valid_credentials(entry)
+
+            # The http transport is not thread-safe, so each thread gets its own services
+            services = vars(entry['services'])
+            service = services.get(type)
+            if service is None:
+                with metrics.stage('connect', service=type):
+                    if type == 'sheets':
+                        service = build('sheets', 'v4', http=self._build_http(creds))
+                    elif type == 'calendar':
+                        service = build('calendar', 'v3', http=self._build_http(creds))
+                    else:
+                        service = build('drive', 'v3', http=self._build_http(creds))
+                services[type] = service
+
         return service
 
+    def _build_http(self, creds):
+        '''Authorized keep-alive transport, retrying quota and server errors'''
+        if self._cassette is not None and self._cassette.mode == 'replay':
+            return RetryHttp(self._cassette.wrap(None), retries=self._retries, rate_limiter=self._rate_limiter)
+
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=self._timeout))
+        http = RetryHttp(http, retries=self._retries, rate_limiter=self._rate_limiter)
+        # Record the final responses, after retries
+        return http if self._cassette is None else self._cassette.wrap(http)
+
+    def _cache_entry(self):
+        '''Returns the cache entry of the current credentials file and scopes, and the
+        lock guarding it'''
+        key = self._cache_key()
+        if self._share_cache:
+            cache, lock = _SHARED_CACHE, _SHARED_CACHE_LOCK
+        else:
+            cache, lock = self._cache, self._cache_lock
+
+        with lock:
+            entry = cache.get(key)
+            if entry is None:
+                if not self._share_cache:
+                    cache.clear()  # Scopes or credentials file changed
+                entry = cache[key] = {'creds': None, 'services': threading.local()}
+
+        return entry, lock
+
+    def _valid_credentials(self, entry):
+        '''Loads or refreshes the credentials of a cache entry if needed. Caller must
+        hold the lock of the entry.'''
+        creds = entry['creds']
+        if creds is None or not creds.valid:
+            with metrics.stage('auth', refresh=creds is not None):
+                new_creds = self._load_credentials(creds)
+            if new_creds is not creds:
+                entry['services'] = threading.local()
+            creds = entry['creds'] = new_creds
+        return creds
+
+    def _credentials(self):
+        '''Valid credentials, shared with the cached services'''
+        entry, lock = self._cache_entry()
+        with lock:
+            return self._valid_credentials(entry)
+
 
 
 class GoogleSheets(GoogleService):
@@ -123,67 +264,98 @@ class GoogleSheets(GoogleService):
     Interface with Google sheets and calendars
 
     '''
-    def __init__(self, SCOPES, api_credentials, auth_dir=None):
-        super().__init__(SCOPES, api_credentials, auth_dir=auth_dir)
+    # Response fields consumed by _build_table and LatexPandas, requested with fetch='masked'
+    _GRID_FIELDS = 'sheets(properties.title,data(columnMetadata.pixelSize,' \
+                   'rowData.values(formattedValue,effectiveFormat(backgroundColor,horizontalAlignment,' \
+                   'textFormat(bold,italic,fontSize)))))'
+    _FETCH_MODES = ('full', 'masked', 'values')
+    # Format of cells without effectiveFormat
+    _DEFAULT_FMT = {'backgroundColor': {'red': 1, 'green': 1, 'blue': 1},
+                    'padding': {'right': 3, 'left': 3},
+                    'verticalAlignment': 'BOTTOM',
+                    'wrapStrategy': 'OVERFLOW_CELL',
+                    'textFormat': {'foregroundColor': {},
+                                   'fontFamily': 'Calibri',
+                                   'fontSize': 11,
+                                   'bold': False,
+                                   'italic': False,
+                                   'strikethrough': False,
+                                   'underline': False,
+                                   'foregroundColorStyle': {'rgbColor': {}}},
+                    'backgroundColorStyle': {'rgbColor': {'red': 1, 'green': 1, 'blue': 1}}}
+
+    def __init__(self, SCOPES, api_credentials, auth_dir=None, cache_dir=None, cache_ttl=None,
+                 cache_max_bytes=512 * 2**20, **kwargs):
+        '''
+        Parameters
+        ----------
+        cache_dir: str, optional
+            Enables the on-disk cache of retrieved tables in this directory. Cached
+            tables are validated against the modification time of the spreadsheet,
+            which requires a drive scope, eg.
+            'https://www.googleapis.com/auth/drive.metadata.readonly'
+        cache_ttl: float, optional
+            Seconds during which cached tables are used without validation
+        cache_max_bytes: int, default 512 MiB
+            Size of the cache, least recently used tables are evicted
+
+        See GoogleService for the other parameters
+        '''
+        super().__init__(SCOPES, api_credentials, auth_dir=auth_dir, **kwargs)
+        self._sheet_cache = SheetCache(cache_dir, cache_max_bytes) if cache_dir else None
+        self._cache_ttl = cache_ttl
+        if self._sheet_cache and not cache_ttl and 'drive' not in self.scope_types:
+            warnings.warn('Cached tables can only be validated with a drive scope, or used within cache_ttl')
 
 
-    def _build_table(self, resp):
+    def _build_table(self, grid):
         '''Builds table using raw API response data, retaining formatting metadata
 
+        Values are filled column-wise into pre-sized lists. Identical cell formats are
+        interned into a format table, cells refer to it with an integer code.
+
         Parameters
         ----------
-        resp
+        grid: dict
+            GridData of a single range, ie. resp['sheets'][0]['data'][0]
 
         Returns
         -------
-
+        dict with 'values' (list of columns), 'codes' (int array, rows x columns),
+        'formats' (list of format dicts, indexed by code) and 'col_widths'
         '''
+        col_widths = [col['pixelSize'] for col in grid.get('columnMetadata', [])]
+        rows = grid.get('rowData', [])
+
+        n_rows = len(rows)
+        n_cols = max([len(col_widths)] + [len(row.get('values', ())) for row in rows])
+
+        # Missing cells keep the default value and format (code 0)
+        values = [[''] * n_rows for _ in range(n_cols)]
+        codes = np.zeros((n_rows, n_cols), dtype=np.int32)
+        formats = [self._DEFAULT_FMT]
+        fmt_codes = {}
 
-        # Ensure row has all cells, fill missing cells w/ default values
-        def fill_missing_cells(cell_list, filler):
-            diff = len(data['col_widths']) - len(cell_list)
-            if diff > 0:
-                cell_list += diff * [filler]
-            return cell_list
-
-        default_val = ''
-        default_fmt = {'backgroundColor': {'red': 1, 'green': 1, 'blue': 1},
-                       'padding': {'right': 3, 'left': 3},
-                       'verticalAlignment': 'BOTTOM',
-                       'wrapStrategy': 'OVERFLOW_CELL',
-                       'textFormat': {'foregroundColor': {},
-                                      'fontFamily': 'Calibri',
-                                      'fontSize': 11,
-                                      'bold': False,
-                                      'italic': False,
-                                      'strikethrough': False,
-                                      'underline': False,
-                                      'foregroundColorStyle': {'rgbColor': {}}},
-                       'backgroundColorStyle': {'rgbColor': {'red': 1, 'green': 1, 'blue': 1}}}
-
-        data = {}  # orderd by rows
-        data['values'] = {}
-        data['format'] = {}
-
-        data['col_widths'] = [col['pixelSize'] for col in resp['sheets'][0]['data'][0]['columnMetadata']]
-
-        rows = resp['sheets'][0]['data'][0]['rowData']
         for i, row in enumerate(rows):
-            cell_vals = []
-            cell_fmt = []
-            for cell in row['values']:
-                try:
-                    cell_vals.append(cell['formattedValue'])
-                except KeyError:
-                    cell_vals.append(default_val)
-
-                try:
-                    cell_fmt.append(cell['effectiveFormat'])
-                except KeyError:
-                    cell_fmt.append(default_fmt)
-
-            data['values'][f'row{i}'] = fill_missing_cells(cell_vals, default_val)
-            data['format'][f'row{i}'] = fill_missing_cells(cell_fmt, default_fmt)
+            for j, cell in enumerate(row.get('values', ())):
+                value = cell.get('formattedValue')
+                if value is not None:
+                    values[j][i] = value
+
+                fmt = cell.get('effectiveFormat')
+                if fmt is not None:
+                    key = repr(fmt)
+                    code = fmt_codes.get(key)
+                    if code is None:
+                        code = fmt_codes[key] = len(formats)
+                        formats.append(fmt)
+                    codes[i, j] = code
+
+        data = {}
+        data['values'] = values
+        data['codes'] = codes
+        data['formats'] = formats
+        data['col_widths'] = col_widths
 
         return data
 
@@ -200,32 +372,254 @@ class GoogleSheets(GoogleService):
             Range of cells to be extracted. Eg: "Sheet1!A2:J15"
         header_row: bool, default False
             Convert first row of cell_range to table column names
+        fetch: str, default 'full'
+            'full' retrieves all cell properties. 'masked' only retrieves the values
+            and formatting used by LatexPandas, which shrinks the response
+            considerably. 'values' only retrieves the cell values, metadata is None.
 
         Returns
         -------
         DataFrame containing values from google sheet
         '''
         header_row = kwargs.pop('header_row', True)
+        fetch = self._fetch_mode(kwargs.pop('fetch', 'full'))
 
         if 'sheets' not in self.scope_types:
             raise AttributeError('Incorrect api scope')
-        # Call the Sheets API
-        service = self._service_connect('sheets')
-        full_resp = service.spreadsheets().get(spreadsheetId=spreadsheet_id, ranges=cell_range,
-                                          includeGridData=True).execute()
 
-        sheet_data = self._build_table(full_resp)
+        with metrics.stage('get_spreadsheet', fetch=fetch):
+            cache_key = (spreadsheet_id, cell_range, fetch, header_row)
+            table, modified = self._cache_lookup(cache_key, {})
+            if table is not None:
+                return table
+
+            # Call the Sheets API
+            service = self._service_connect('sheets')
+            if fetch == 'values':
+                with metrics.stage('request', api='sheets'):
+                    resp = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id,
+                                                               range=cell_range).execute()
+                table = self._values_frames(resp.get('values', []), header_row)
+            else:
+                full_resp = self._get_grid(service, spreadsheet_id, cell_range, fetch)
+                table = self._table_frames(full_resp['sheets'][0]['data'][0], header_row)
 
-        if header_row:
-            df = pd.DataFrame.from_dict(sheet_data['values'][1:], columns=sheet_data['values'][0], orient='index')
-        else:
-            df = pd.DataFrame.from_dict(sheet_data['values'], orient='index')
+            self._cache_store(cache_key, table, modified)
+            return table
 
-        fmt_df = pd.DataFrame.from_dict(sheet_data['format'], orient='index')
 
-        metadata = {}
-        metadata['fmt_df'] = fmt_df
-        metadata['col_widths'] = sheet_data['col_widths']
+    def get_spreadsheets(self, ranges, **kwargs) -> list:
+        '''
+        Retrieve multiple ranges, possibly from several spreadsheets, with a single
+        API request per spreadsheet.
+
+        Ranges are matched to the response by sheet name, so they must be given in
+        A1 notation, eg. "Sheet1!A2:J15". Ranges without a sheet name refer to the
+        first sheet. Named ranges are not supported, use get_spreadsheet instead.
+
+        Parameters
+        ----------
+        ranges: list of tuple
+            (spreadsheet_id, cell_range) pairs, see get_spreadsheet
+        header_row: bool, default True
+            Convert first row of each cell_range to table column names
+        fetch: str, default 'full'
+            See get_spreadsheet. With 'values', named ranges are supported.
+
+        Returns
+        -------
+        List of (DataFrame, metadata) tuples, in the order of ranges
+        '''
+        header_row = kwargs.pop('header_row', True)
+        fetch = self._fetch_mode(kwargs.pop('fetch', 'full'))
+
+        if 'sheets' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        tables = [None] * len(ranges)
+        modified_times = {}
+        for spreadsheet_id, requested in self._group_ranges(ranges).items():
+            # Serve cached ranges, request the others
+            missing = []
+            for i, cell_range in requested:
+                tables[i], _ = self._cache_lookup((spreadsheet_id, cell_range, fetch, header_row),
+                                                         modified_times)
+                if tables[i] is None:
+                    missing.append((i, cell_range))
+            if not missing:
+                continue
+
+            service = self._service_connect('sheets')
+            unique_ranges = list(dict.fromkeys(cell_range for _, cell_range in missing))
+            if fetch == 'values':
+                with metrics.stage('request', api='sheets'):
+                    resp = service.spreadsheets().values().batchGet(spreadsheetId=spreadsheet_id,
+                                                                    ranges=unique_ranges).execute()
+            else:
+                resp = self._get_grid(service, spreadsheet_id, unique_ranges, fetch)
+            self._fill_tables(tables, missing, unique_ranges, resp, fetch, header_row)
+
+            if self._sheet_cache is not None:
+                # Checked before the request, so changes made meanwhile invalidate the entries
+                modified = self._modified_time(spreadsheet_id, modified_times)
+                for cell_range, i in {cell_range: i for i, cell_range in reversed(missing)}.items():
+                    self._cache_store((spreadsheet_id, cell_range, fetch, header_row), tables[i], modified)
+
+        return tables
+
+
+    def _modified_time(self, spreadsheet_id, modified_times):
+        '''Modification time of the spreadsheet according to Drive, None without a
+        drive scope. Memoized in modified_times.'''
+        if 'drive' not in self.scope_types:
+            return None
+        if spreadsheet_id not in modified_times:
+            service = self._service_connect('drive')
+            modified_times[spreadsheet_id] = service.files().get(fileId=spreadsheet_id, fields='modifiedTime',
+                                                                 supportsAllDrives=True).execute()['modifiedTime']
+        return modified_times[spreadsheet_id]
+
+
+    def _cache_lookup(self, cache_key, modified_times):
+        '''Returns the cached table of cache_key if still valid, else None, and the
+        current modification time of the spreadsheet if it had to be checked'''
+        if self._sheet_cache is None:
+            return None, None
+
+        header = self._sheet_cache.header(cache_key)
+        if header is not None and self._cache_ttl and time.time() - header['stored'] < self._cache_ttl:
+            table = self._sheet_cache.load(cache_key)
+            if table is not None:
+                metrics.emit('sheet_cache', hits=1, misses=0)
+                return table, header['modified']
+
+        modified = self._modified_time(cache_key[0], modified_times)
+        table = None
+        if header is not None and modified is not None and header['modified'] == modified:
+            table = self._sheet_cache.load(cache_key)
+        metrics.emit('sheet_cache', hits=int(table is not None), misses=int(table is None))
+        return table, modified
+
+
+    def _cache_store(self, cache_key, table, modified):
+        if self._sheet_cache is not None:
+            self._sheet_cache.put(cache_key, table, modified)
+
+
+    @staticmethod
+    def _group_ranges(ranges):
+        '''Group requested ranges per spreadsheet, keeping their original position'''
+        grouped = {}
+        for i, (spreadsheet_id, cell_range) in enumerate(ranges):
+            grouped.setdefault(spreadsheet_id, []).append((i, cell_range))
+        return grouped
+
+
+    def _fill_tables(self, tables, requested, unique_ranges, resp, fetch, header_row):
+        '''Converts a multi-range response of one spreadsheet, storing the tables at the
+        original positions of the requested ranges'''
+        if fetch == 'values':
+            # valueRanges are returned in the order of the requested ranges
+            values = dict(zip(unique_ranges, (vr.get('values', []) for vr in resp['valueRanges'])))
+            for i, cell_range in requested:
+                tables[i] = self._values_frames(values[cell_range], header_row)
+        else:
+            grids = self._match_ranges(resp, unique_ranges)
+            for i, cell_range in requested:
+                tables[i] = self._table_frames(grids[cell_range], header_row)
+
+
+    def _fetch_mode(self, fetch):
+        if fetch not in self._FETCH_MODES:
+            raise ValueError(f'fetch must be one of {self._FETCH_MODES}, not "{fetch}"')
+        return fetch
+
+
+    def _get_grid(self, service, spreadsheet_id, ranges, fetch):
+        '''Request grid data of one or more ranges, restricted to _GRID_FIELDS if masked'''
+        kwargs = {}
+        if fetch == 'masked':
+            kwargs['fields'] = self._GRID_FIELDS
+        with metrics.stage('request', api='sheets'):
+            return service.spreadsheets().get(spreadsheetId=spreadsheet_id, ranges=ranges,
+                                              includeGridData=True, **kwargs).execute()
+
+
+    @staticmethod
+    def _range_sheet_name(cell_range, sheet_titles=()):
+        '''Sheet name of an A1 notation range, None if the range has no sheet name.
+        A range equal to one of sheet_titles refers to that entire sheet, even if it
+        looks like a cell range, eg. 'Data' or 'Budget2020'.'''
+        if '!' in cell_range:
+            name = cell_range.rsplit('!', 1)[0]
+        else:
+            name = cell_range  # Entire sheet
+        if len(name) > 1 and name[0] == name[-1] == "'":
+            name = name[1:-1].replace("''", "'")
+        if '!' not in cell_range and name not in sheet_titles and \
+                re.fullmatch(r'[A-Za-z]*\d*(:[A-Za-z]*\d*)?', cell_range):
+            return None
+        return name
+
+
+    def _match_ranges(self, resp, cell_ranges):
+        '''Map requested ranges to the GridData of a multi-range response. Within a
+        sheet, the API returns GridData in the order the ranges were requested.'''
+        sheets = resp['sheets']
+        pending = {sheet['properties']['title']: list(sheet.get('data', [])) for sheet in sheets}
+        first_sheet = sheets[0]['properties']['title']
+
+        grids = {}
+        for cell_range in cell_ranges:
+            name = self._range_sheet_name(cell_range, pending) or first_sheet
+            try:
+                grids[cell_range] = pending[name].pop(0)
+            except (KeyError, IndexError):
+                raise KeyError(f'No data returned for range "{cell_range}"')
+
+        return grids
+
+
+    @staticmethod
+    def _values_frame(columns, header_row):
+        '''DataFrame from a list of equal length column lists'''
+        header = None
+        if header_row and columns and columns[0]:
+            header = [col[0] for col in columns]
+            columns = [col[1:] for col in columns]
+
+        df = pd.DataFrame(dict(enumerate(columns)), columns=range(len(columns)))
+        if header is not None:
+            df.columns = header
+        return df
+
+
+    def _values_frames(self, values, header_row):
+        '''Converts a values().get response to a DataFrame, without metadata. The API
+        omits trailing empty cells, so rows are padded to equal length.'''
+        n_cols = max((len(row) for row in values), default=0)
+        columns = [[row[j] if j < len(row) else '' for row in values] for j in range(n_cols)]
+
+        return self._values_frame(columns, header_row), None
+
+
+    def _table_frames(self, grid, header_row):
+        '''Converts GridData to a DataFrame of values and the formatting metadata.
+        metadata['cell_formats'] holds the compact formatting used by LatexPandas.
+        metadata['fmt_df'] holds format codes, indexing the raw metadata['formats'].'''
+        with metrics.stage('build_table') as info:
+            sheet_data = self._build_table(grid)
+            info['cells'] = sheet_data['codes'].size
+
+        with metrics.stage('frames'):
+            df = self._values_frame(sheet_data['values'], header_row)
+
+            metadata = {}
+            metadata['fmt_df'] = pd.DataFrame(sheet_data['codes'])
+            metadata['formats'] = sheet_data['formats']
+            metadata['col_widths'] = sheet_data['col_widths']
+            metadata['cell_formats'] = CellFormats.from_formats(sheet_data['codes'], sheet_data['formats'],
+                                                                sheet_data['col_widths'])
 
         return df, metadata
 
@@ -235,8 +629,74 @@ class GoogleSheets(GoogleService):
 
 
 class GoogleCalendar(GoogleService):
-    def __init__(self, SCOPES, api_credentials, auth_dir=None):
-        super().__init__(SCOPES, api_credentials, auth_dir=auth_dir)
+    def __init__(self, SCOPES, api_credentials, auth_dir=None, store_dir=None, **kwargs):
+        '''
+        Parameters
+        ----------
+        store_dir: str, default '<auth_dir>/calendars'
+            Directory of the local event store, used by sync_calendar
+
+        See GoogleService for the other parameters
+        '''
+        super().__init__(SCOPES, api_credentials, auth_dir=auth_dir, **kwargs)
+        self._store_dir = store_dir or os.path.join(self._auth_dir, 'calendars')
+        self._store = None
+
+    @property
+    def store(self) -> CalendarStore:
+        '''Local event store, opened on first use'''
+        if self._store is None:
+            self._store = CalendarStore(self._store_dir)
+        return self._store
+
+    def sync_calendar(self, cal_id='primary', max_results=250) -> int:
+        '''
+        Synchronize the local event store with a calendar. The first sync downloads
+        all events, later syncs only retrieve events changed since the previous sync.
+        Falls back to a full sync if the server invalidated the sync token.
+
+        Parameters
+        ----------
+        cal_id: str, default 'primary'
+            Google calendar id, identified using 'get_calendar_ids' method
+        max_results: int, default 250
+            Number of events per page, at most 2500
+
+        Returns
+        -------
+        int, number of new, changed or cancelled events
+        '''
+        if 'calendar' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        sync_token = self.store.sync_token(cal_id)
+        try:
+            events, next_token = self._list_changes(cal_id, sync_token, max_results)
+        except HttpError as e:
+            if e.resp.status != 410 or sync_token is None:
+                raise
+            # 410 Gone: sync token expired, start over with a full sync
+            self.store.clear(cal_id)
+            sync_token = None
+            events, next_token = self._list_changes(cal_id, None, max_results)
+
+        return self.store.apply(cal_id, events, next_token, full=sync_token is None)
+
+    def _list_changes(self, cal_id, sync_token, max_results):
+        '''All events changed since sync_token (all events if None), and the next sync token'''
+        service = self._service_connect('calendar')
+
+        events = []
+        page_token = None
+        while True:
+            with metrics.stage('request', api='calendar'):
+                events_result = service.events().list(calendarId=cal_id, singleEvents=True, maxResults=max_results,
+                                                      syncToken=sync_token, pageToken=page_token,
+                                                      showDeleted=sync_token is not None).execute()
+            events += events_result.get('items', [])
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return events, events_result.get('nextSyncToken')
 
     def get_calendar_ids(self, output=False) -> dict:
         '''
@@ -273,7 +733,58 @@ class GoogleCalendar(GoogleService):
         return name_ids
 
 
-    def get_calendar_events(self, cal_id='primary', start=None, end=None) -> list:
+    def iter_calendar_events(self, cal_id='primary', start=None, end=None, max_results=250, fields=None):
+        '''
+        Iterate over calendar events stored as dictionaries. Pages of events are
+        requested as the iteration proceeds, following nextPageToken.
+
+        Parameters
+        ----------
+        cal_id: str, default 'primary'
+            Google calendar id, identified using 'get_calendar_ids' method
+        start: datetime, optional
+            Datetime in UTC isoformat. Defaults to 'now'.
+            Example: datetime.utcnow().isoformat() + 'Z'
+        end: datetime, optional
+            Same format as 'start'.
+            Must come after 'start', or after *now* if 'start' not specified.
+        max_results: int, default 250
+            Number of events per page, at most 2500
+        fields: str, optional
+            Event fields to retrieve, eg. 'id,summary,start,end'. Retrieves all fields
+            if not specified.
+
+        Yields
+        ------
+        dict
+        '''
+        if 'calendar' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        if start is None:
+            start = datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
+
+        kwargs = {}
+        if fields:
+            kwargs['fields'] = f'nextPageToken,items({fields})'
+
+        service = self._service_connect('calendar')
+        # Call the Calendar API
+        page_token = None
+        while True:
+            with metrics.stage('request', api='calendar'):
+                events_result = service.events().list(calendarId=cal_id, timeMin=start,
+                                                      timeMax=end, singleEvents=True,
+                                                      orderBy='startTime', maxResults=max_results,
+                                                      pageToken=page_token, **kwargs).execute()
+            yield from events_result.get('items', [])
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                break
+
+
+    def get_calendar_events(self, cal_id='primary', start=None, end=None, max_results=250, fields=None,
+                            sync=False) -> list:
         '''
         Retrieve a list of calendar events stored as dictionaries
 
@@ -287,25 +798,98 @@ class GoogleCalendar(GoogleService):
         end: datetime, optional
             Same format as 'start'.
             Must come after 'start', or after *now* if 'start' not specified.
+        max_results: int, default 250
+            Number of events per request, see iter_calendar_events
+        fields: str, optional
+            Event fields to retrieve, see iter_calendar_events. Ignored if sync is used.
+        sync: bool, default False
+            Incrementally synchronize the local event store, see sync_calendar, and
+            return the events from the store.
 
         Returns
         -------
         List of dictionaries
         '''
+        with metrics.stage('get_calendar_events', sync=sync) as info:
+            if sync:
+                if start is None:
+                    start = datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
+                self.sync_calendar(cal_id, max_results=max_results)
+                events = self.store.events(cal_id, start, end)
+            else:
+                events = list(self.iter_calendar_events(cal_id, start, end, max_results=max_results, fields=fields))
+            info['events'] = len(events)
+        return events
+
+
+    def get_calendar_events_df(self, cal_id='primary', start=None, end=None, max_results=250,
+                               fields=None) -> pd.DataFrame:
+        '''
+        Retrieve calendar events as a DataFrame, one row per event. Nested fields are
+        flattened to columns, eg. 'start.dateTime'.
+
+        Parameters
+        ----------
+        See get_calendar_events
+
+        Returns
+        -------
+        DataFrame
+        '''
+        events = self.iter_calendar_events(cal_id, start, end, max_results=max_results, fields=fields)
+        return pd.json_normalize(list(events))
+
+
+    def get_events_for_calendars(self, cal_ids, start=None, end=None, max_workers=8, **kwargs) -> tuple:
+        '''
+        Retrieve the events of several calendars concurrently, merged into a single
+        list ordered by start time. Failures are isolated per calendar.
+
+        Parameters
+        ----------
+        cal_ids: list of str or dict
+            Google calendar ids, or the name:ID dict returned by 'get_calendar_ids'
+        start: datetime, optional
+            Datetime in UTC isoformat. Defaults to 'now'.
+        end: datetime, optional
+            Same format as 'start'.
+        max_workers: int, default 8
+            Number of calendars fetched simultaneously
+        kwargs:
+            max_results, fields or sync, see get_calendar_events
+
+        Returns
+        -------
+        (events, errors): List of dictionaries, each with its 'calendarId' added, and a
+        dict of calendar id: exception for the calendars that could not be retrieved
+        '''
         if 'calendar' not in self.scope_types:
             raise AttributeError('Incorrect api scope')
 
+        if isinstance(cal_ids, dict):
+            cal_ids = list(cal_ids.values())
         if start is None:
-            start = datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
+            start = datetime.utcnow().isoformat() + 'Z' # Same 'now' for all calendars
 
-        service = self._service_connect('calendar')
-        # Call the Calendar API
-        events_result = service.events().list(calendarId=cal_id, timeMin=start,
-                                              timeMax=end, singleEvents=True,
-                                              orderBy='startTime').execute()
-        events = events_result.get('items', [])
+        def fetch(cal_id):
+            try:
+                return self.get_calendar_events(cal_id, start, end, **kwargs), None
+            except Exception as e:
+                return None, e
 
-        return events
+        events = []
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for cal_id, (cal_events, error) in zip(cal_ids, pool.map(fetch, cal_ids)):
+                if error is not None:
+                    errors[cal_id] = error
+                    continue
+                for event in cal_events:
+                    event['calendarId'] = cal_id
+                events += cal_events
+
+        events.sort(key=lambda event: CalendarStore._utc(event.get('start')) or '')
+        return events, errors
 
 
 
@@ -313,7 +897,7 @@ class GoogleCalendar(GoogleService):
 
 
 if __name__ == '__main__':
-    # If modifying these scopes, delete the file token.pickle.
+    # If modifying these scopes, delete the file token.json.
     SCOPES = ['https://www.googleapis.com/auth/calendar.readonly', 'https://www.googleapis.com/auth/spreadsheets.readonly']
     cal_api_creds = 'py_general_creds.json'
 
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: google_async
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+
+Asyncio counterparts of GoogleSheets and GoogleCalendar. Requires aiohttp:
+    pip install LuigiPyTools[async]
+
+"""
+import asyncio
+from datetime import datetime
+from urllib.parse import quote
+
+import pandas as pd
+
+from LuigiPyTools.calendar_store import CalendarStore
+from LuigiPyTools.google_api import GoogleService, GoogleSheets, GoogleCalendar
+from LuigiPyTools.transport import RETRY_STATUSES, backoff_delay, retry_after
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncGoogleService(GoogleService):
+    '''
+    Description
+    -----------
+    Shares the credential handling of GoogleService, but requests the REST APIs
+    through a pooled aiohttp session with bounded concurrency. Close the session
+    with aclose, or use the instance as an async context manager.
+
+    '''
+    API_URLS = {'sheets': 'https://sheets.googleapis.com/v4/',
+                'calendar': 'https://www.googleapis.com/calendar/v3/'}
+
+    def __init__(self, SCOPES, api_credentials, auth_dir=None, max_concurrency=20, api_urls=None, **kwargs):
+        '''
+
+        Parameters
+        ----------
+        max_concurrency: int, default 20
+            Maximum number of simultaneous requests, and connections kept alive
+        api_urls: dict, optional
+            Base url per api type, 'sheets' and 'calendar'. Defaults to API_URLS
+
+        See GoogleService for the other parameters, timeout, retries and rate_limit
+        apply to the async requests as well
+        '''
+        if aiohttp is None:
+            raise ImportError('Async clients require aiohttp: pip install LuigiPyTools[async]')
+        super().__init__(SCOPES, api_credentials, auth_dir=auth_dir, **kwargs)
+        self._max_concurrency = max_concurrency
+        self._api_urls = dict(self.API_URLS, **(api_urls or {}))
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        '''Closes the http session and its pooled connections'''
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        # Created on first use, so that it belongs to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._max_concurrency)
+            timeout = aiohttp.ClientTimeout(total=self._timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._session
+
+    async def _async_credentials(self):
+        '''Valid credentials. Loading or refreshing them blocks, so that runs in the
+        default executor.'''
+        entry, _ = self._cache_entry()
+        creds = entry['creds']
+        if creds is not None and creds.valid:
+            return creds
+        return await asyncio.get_running_loop().run_in_executor(None, self._credentials)
+
+    @staticmethod
+    def _query(params):
+        '''Query parameters as (key, value) pairs: None is dropped, lists are repeated'''
+        query = []
+        for key, value in params.items():
+            if value is None:
+                continue
+            for v in (value if isinstance(value, (list, tuple)) else [value]):
+                query.append((key, str(v).lower() if isinstance(v, bool) else str(v)))
+        return query
+
+    async def _request(self, type, path, **params):
+        '''GET request to the api of type ('sheets' or 'calendar'), returns the parsed
+        JSON response. Quota and server errors are retried, see GoogleService.'''
+        session = self._get_session()
+        url = self._api_urls[type] + path
+        query = self._query(params)
+
+        attempt = 0
+        while True:
+            if self._rate_limiter is not None:
+                await asyncio.sleep(self._rate_limiter.reserve())
+            headers = {}
+            (await self._async_credentials()).apply(headers)
+            try:
+                async with self._semaphore:
+                    async with session.get(url, params=query, headers=headers) as resp:
+                        if resp.status not in RETRY_STATUSES or attempt >= self._retries:
+                            resp.raise_for_status()
+                            return await resp.json()
+                        delay = backoff_delay(attempt, retry_after_s=retry_after(resp.headers.get('Retry-After')))
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self._retries:
+                    raise
+                delay = backoff_delay(attempt)
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+
+class AsyncGoogleSheets(AsyncGoogleService, GoogleSheets):
+    '''
+    Description
+    -----------
+    Asyncio interface with Google sheets, see GoogleSheets
+
+    '''
+    def __init__(self, SCOPES, api_credentials, auth_dir=None, **kwargs):
+        '''
+        Parameters
+        ----------
+        See AsyncGoogleService. The on-disk table cache of GoogleSheets (cache_dir) is
+        not available for the async client.
+        '''
+        if kwargs.get('cache_dir'):
+            raise ValueError('AsyncGoogleSheets does not support cache_dir, use GoogleSheets instead')
+        super().__init__(SCOPES, api_credentials, auth_dir=auth_dir, **kwargs)
+
+    async def _get_ranges(self, spreadsheet_id, ranges, fetch):
+        '''Request one or more ranges of a spreadsheet, see GoogleSheets._get_grid'''
+        path = 'spreadsheets/' + quote(spreadsheet_id, safe='')
+        if fetch == 'values':
+            return await self._request('sheets', path + '/values:batchGet', ranges=ranges)
+
+        fields = self._GRID_FIELDS if fetch == 'masked' else None
+        return await self._request('sheets', path, ranges=ranges, includeGridData=True, fields=fields)
+
+    async def get_spreadsheet(self, spreadsheet_id, cell_range, **kwargs) -> tuple:
+        '''
+        Retrieve google spreadsheet data to Pandas DataFrame, see GoogleSheets.get_spreadsheet
+        '''
+        return (await self.get_spreadsheets([(spreadsheet_id, cell_range)], **kwargs))[0]
+
+    async def get_spreadsheets(self, ranges, **kwargs) -> list:
+        '''
+        Retrieve multiple ranges, with a single concurrent request per spreadsheet.
+        See GoogleSheets.get_spreadsheets
+        '''
+        header_row = kwargs.pop('header_row', True)
+        fetch = self._fetch_mode(kwargs.pop('fetch', 'full'))
+
+        if 'sheets' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        tables = [None] * len(ranges)
+        grouped = self._group_ranges(ranges)
+        unique_ranges = {spreadsheet_id: list(dict.fromkeys(cell_range for _, cell_range in requested))
+                         for spreadsheet_id, requested in grouped.items()}
+
+        responses = await asyncio.gather(*(self._get_ranges(spreadsheet_id, unique_ranges[spreadsheet_id], fetch)
+                                           for spreadsheet_id in grouped))
+        for (spreadsheet_id, requested), resp in zip(grouped.items(), responses):
+            self._fill_tables(tables, requested, unique_ranges[spreadsheet_id], resp, fetch, header_row)
+
+        return tables
+
+
+
+class AsyncGoogleCalendar(AsyncGoogleService, GoogleCalendar):
+    '''
+    Description
+    -----------
+    Asyncio interface with Google calendar, see GoogleCalendar
+
+    '''
+    async def get_calendar_ids(self, output=False) -> dict:
+        '''
+        Return a dictionary of user's calendar names and IDs, see GoogleCalendar.get_calendar_ids
+        '''
+        if 'calendar' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        page_token = None
+        name_ids = {}
+        while True:
+            calendar_list = await self._request('calendar', 'users/me/calendarList', pageToken=page_token)
+            for calendar_list_entry in calendar_list['items']:
+                name = calendar_list_entry['summary']
+                id = calendar_list_entry['id']
+                name_ids[name] = id
+                if output:
+                    print(f'{name} ---> {id}')
+            page_token = calendar_list.get('nextPageToken')
+            if not page_token:
+                break
+
+        return name_ids
+
+    async def iter_calendar_events(self, cal_id='primary', start=None, end=None, max_results=250, fields=None):
+        '''
+        Asynchronously iterate over calendar events, see GoogleCalendar.iter_calendar_events
+        '''
+        if 'calendar' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        if start is None:
+            start = datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
+        if fields:
+            fields = f'nextPageToken,items({fields})'
+
+        path = 'calendars/' + quote(cal_id, safe='') + '/events'
+        page_token = None
+        while True:
+            events_result = await self._request('calendar', path, timeMin=start, timeMax=end, singleEvents=True,
+                                                orderBy='startTime', maxResults=max_results,
+                                                pageToken=page_token, fields=fields)
+            for event in events_result.get('items', []):
+                yield event
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                break
+
+    async def get_calendar_events(self, cal_id='primary', start=None, end=None, max_results=250, fields=None,
+                                  sync=False) -> list:
+        '''
+        Retrieve a list of calendar events, see GoogleCalendar.get_calendar_events.
+        With sync, the local event store is synchronized in the default executor.
+        '''
+        if sync:
+            if start is None:
+                start = datetime.utcnow().isoformat() + 'Z' # 'Z' indicates UTC time
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.sync_calendar, cal_id, max_results)
+            return await loop.run_in_executor(None, self.store.events, cal_id, start, end)
+
+        return [event async for event in self.iter_calendar_events(cal_id, start, end, max_results=max_results,
+                                                                   fields=fields)]
+
+    async def get_calendar_events_df(self, cal_id='primary', start=None, end=None, max_results=250,
+                                     fields=None) -> pd.DataFrame:
+        '''
+        Retrieve calendar events as a DataFrame, see GoogleCalendar.get_calendar_events_df
+        '''
+        return pd.json_normalize(await self.get_calendar_events(cal_id, start, end, max_results=max_results,
+                                                                fields=fields))
+
+    async def get_events_for_calendars(self, cal_ids, start=None, end=None, **kwargs) -> tuple:
+        '''
+        Retrieve the events of several calendars concurrently, bounded by max_concurrency.
+        See GoogleCalendar.get_events_for_calendars
+        '''
+        if 'calendar' not in self.scope_types:
+            raise AttributeError('Incorrect api scope')
+
+        if isinstance(cal_ids, dict):
+            cal_ids = list(cal_ids.values())
+        if start is None:
+            start = datetime.utcnow().isoformat() + 'Z' # Same 'now' for all calendars
+
+        results = await asyncio.gather(*(self.get_calendar_events(cal_id, start, end, **kwargs)
+                                         for cal_id in cal_ids), return_exceptions=True)
+        events = []
+        errors = {}
+        for cal_id, cal_events in zip(cal_ids, results):
+            if isinstance(cal_events, Exception):
+                errors[cal_id] = cal_events
+                continue
+            for event in cal_events:
+                event['calendarId'] = cal_id
+            events += cal_events
+
+        events.sort(key=lambda event: CalendarStore._utc(event.get('start')) or '')
+        return events, errors
@@ -7,52 +7,159 @@ project: DSE-Mars-Reveal
 date: 5/18/2020
 author: lmaio
 
-TODO:
-    - add sub-table handler for \n
-    - allow longtable use when no metadata is provided... replace with gen_table_v2
-
 """
 import pandas as pd
 import numpy as np
 import ntpath
+import itertools
+import io
+import os
+import tempfile
+import stat
+import filecmp
+import hashlib
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from LuigiPyTools import metrics
+from LuigiPyTools.cell_formats import CellFormats
+from LuigiPyTools.latex_templates import TEMPLATES
+from LuigiPyTools.text_wrap import wrap_column
+
+# Process umask, read once at import: setting it at runtime would race with other threads
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
 
 class LatexPandas():
-    def __init__(self, dataframe, metadata=None, col_width=45):
+    # LaTeX special characters and their escaped form, applied in a single pass
+    _TEX_ESCAPES = str.maketrans({'&': '\\&', '%': '\\%', '$': '\\$', '#': '\\#', '_': '\\_',
+                                  '{': '\\{', '}': '\\}', '~': '\\textasciitilde{}',
+                                  '^': '\\textasciicircum{}', '\\': '\\textbackslash{}', '\n': ''})
+
+    def __init__(self, dataframe, metadata=None, col_width=45, float_format='%.3f'):
         '''Convert Pandas Dataframe to latex table
 
+        The DataFrame is not copied nor modified. Escaping and number formatting are
+        done when the table is generated.
+
         Parameters
         ----------
         dataframe: pd.Dataframe
             Pandas DataFrame to convert
-        col_width: int, default 45
-            Max character width per column, equal for all columns
+        metadata: dict or CellFormats, optional
+            Sheet formatting, as returned by GoogleSheets.get_spreadsheet
+        col_width: int, list or dict, default 45
+            Max character width of the column text, for tables without metadata. Either
+            equal for all columns, or per column as a list or a dict by column name
+        float_format: str, default '%.3f'
+            Format of floating point values
         '''
         self._metadata = metadata
         self._max_col_width = col_width
-        self._df = dataframe
-        self._df.fillna('', inplace=True)
-        self._df = self._df.applymap(self._fix_chars)
+        self._float_format = float_format
+        self._source = dataframe
 
-        if self._metadata:
-            self._gsheet_formatting(metadata)
-
-    def _fix_chars(self, s, charset=('&', '$', '%')):
-        for char in charset:
-            s = s.replace(char, '\\' + char)
-            s = s.replace('\n', '')
+    def _render_frame(self, wrap=False, source=None, formats=None, color_ids=None):
+        '''Returns the source DataFrame as escaped and formatted strings, including the
+        sheet formatting if metadata was given. With wrap, long text is split over the
+        lines of a sub-table.
 
-        return s
+        A chunk of rows is rendered by passing it as source, with its CellFormats rows
+        and the colours of the whole table, see _table_colors.
+        '''
+        if source is None:
+            source = self._source
+            if self._metadata:
+                formats = self._data_formats(len(source))
+
+        columns = {}
+        for i, (name, col) in enumerate(source.items()):
+            columns[i] = self._format_column(col, self._column_width(i, name) if wrap else None)
+        df = pd.DataFrame(columns, index=source.index, columns=range(source.shape[1]))
+        df.columns = source.columns
+
+        if formats is not None:
+            df = self._gsheet_formatting(df, formats, color_ids)
+        return df
+
+    def _column_width(self, i, name):
+        '''Max character width of column i, named name'''
+        if isinstance(self._max_col_width, dict):
+            return self._max_col_width.get(name, self._max_col_width.get(i, 45))
+        if isinstance(self._max_col_width, (list, tuple)):
+            return self._max_col_width[i]
+        return self._max_col_width
+
+    def _format_column(self, col, width=None):
+        '''Formats a column to strings according to its dtype. Text is escaped, missing
+        values are empty. Text is wrapped to width, if given.'''
+        if pd.api.types.is_bool_dtype(col):
+            return col.astype(str).where(col.notna(), '')
+        if pd.api.types.is_float_dtype(col):
+            values = col.to_numpy(dtype=float, na_value=np.nan)
+            text = np.char.mod(self._float_format, values).astype(object)
+            text[np.isnan(values)] = ''
+            return pd.Series(text, index=col.index)
+        if pd.api.types.is_integer_dtype(col):
+            return col.astype(str).where(col.notna(), '')
+
+        text = self._text_column(col)
+        if width is None:
+            return self._escape_column(text)
+        return wrap_column(text, width, formatter=self._sub_table)
+
+    def _text_column(self, col):
+        '''Column as unescaped strings. Non-string values, ie. numbers in an object
+        column, are formatted individually.'''
+        if not pd.api.types.is_object_dtype(col) and not pd.api.types.is_string_dtype(col):
+            col = col.astype(str).where(col.notna(), '')
+        text = col.astype(object).where(col.notna(), '')
+        other = text.map(type) != str
+        if other.any():
+            text[other] = text[other].map(self._format_value)
+        return text
+
+    def _format_value(self, v):
+        '''Formats a single non-string value of a text column'''
+        if isinstance(v, (float, np.floating)):
+            return self._float_format % v
+        return str(v)
+
+    def _fix_chars(self, s):
+        '''Escapes LaTeX special characters of a single string'''
+        return s.translate(self._TEX_ESCAPES)
+
+    def _escape_column(self, col):
+        '''Escapes LaTeX special characters of all strings in a column'''
+        return col.str.translate(self._TEX_ESCAPES)
+
+    @staticmethod
+    def _tex_num(x):
+        '''Shortest string representation of a colour component, ie. '1' or '0.6431373' '''
+        x = float(x)
+        return str(int(x)) if x.is_integer() else repr(x)
+
+    def _table_colors(self, formats):
+        '''Names the unique background colours of the cells, white excluded
 
-    def _rgb_cell(self, d):
-        r = str(d['backgroundColor']['red'])
-        g = str(d['backgroundColor']['green'])
-        b = str(d['backgroundColor']['blue'])
+        Returns
+        -------
+        (color_ids, definitions): index of the colour of each unique format, -1 for
+        white, and the definecolor lines of the colours, named _COLOR_PREFIX + index
+        '''
+        used = np.zeros(len(formats.background), dtype=bool)
+        used[formats.codes] = True
+        used &= ~np.all(formats.background == 1, axis=1)
 
-        if (r, g, b) == ('1', '1', '1'):
-            return ''
+        colors, inverse = np.unique(formats.background[used], axis=0, return_inverse=True)
+        color_ids = np.full(len(formats.background), -1, dtype=np.int64)
+        color_ids[used] = inverse.ravel()
 
-        tex = '\\cellcolor[rgb]{' + r + ',' + g + ',' + b + '} '
-        return tex
+        definitions = ['\\definecolor{%s%d}{rgb}{%s}\n' % (self._COLOR_PREFIX, i, ','.join(map(self._tex_num, rgb)))
+                       for i, rgb in enumerate(colors)]
+        return color_ids, definitions
 
     def _tex_col_format_metadata(self, metadata):
         '''Calculate col width percentages of \textwidth based on col widths
@@ -62,14 +169,12 @@ class LatexPandas():
 
         # Allow str to be passed for col_form
         try:
-            widths = metadata['col_widths']
-            fmt_df = metadata['fmt_df']
+            formats = self._cell_formats(metadata)
+            widths = formats.col_widths or []
 
             rel_widths = [round(w / sum(widths), 4) for w in widths]  # fractions of tot num cols (for tabularx)
-            row0 = fmt_df.iloc[0]
-            h_fmt = [col['horizontalAlignment'] for col in row0]
-            align_rename = {'LEFT': 'L', 'CENTER': 'C', 'RIGHT': 'R'}
-            h_align = [align_rename.get(item, item) for item in h_fmt]
+            align_letters = np.array(['L', 'L', 'C', 'R'])  # Unspecified alignment is left
+            h_align = align_letters[formats.cell_alignment()[0]]
 
             for a, w in zip(h_align, rel_widths):
                 col_str = '%s{\\dimexpr %.4f\\linewidth-2\\tabcolsep} ' % (a, w)
@@ -86,53 +191,54 @@ class LatexPandas():
         return tex
 
 
-    def _gsheet_formatting(self, metadata):
-        rgb_tex = metadata['fmt_df'].applymap(self._rgb_cell)  # Extract RGB values to df of tex cellcolor commands
-        self._df = rgb_tex.apply(lambda x: x + self._df[x.name])
-
-
-    def _make_sub_table(self, s):
-        # FIXME: recognize existing line breaks in a cell
-        s = self._fix_chars(s)
-
-        lines = s.split('\n')
-        for idx, s in enumerate(lines):
-
-            if len(s) > self._max_col_width:
-                words = s.split(' ')
-                len_w = [len(word) + 1 for word in words]
-                len_aft_w = np.cumsum(len_w)
-                b = len_aft_w % self._max_col_width
-                c = np.where((b[1:] - b[:-1]) < 0)
-
-                break_idx = len_aft_w[c].tolist()
-
-                ext = 0
-                for i in break_idx:
-                    i += ext
-                    s = s[:i] + '\\\\' + s[i:]
-                    ext += 2
-
-                lines[idx] = s
-
-        # Wrap with table header
-        tab_st = '\\begin{tabular}[c]{@{}c@{}}'
-        tab_end = '\\end{tabular}'
-
-        # recombine list of lines into single string, joining with breakline \\\\
-        create_table = False
-        sub_table = lines[0]
-        for line in lines[1:]:
-            sub_table += '\\\\'
-            sub_table += line
-            create_table = True
-
-        if '\\\\' in sub_table:
-            sub_table = tab_st + sub_table + tab_end
+    def _cell_formats(self, metadata):
+        '''Returns metadata as CellFormats. Metadata of older versions holds the format
+        dicts in fmt_df, possibly as codes indexing metadata['formats'].'''
+        if isinstance(metadata, CellFormats):
+            return metadata
+        if 'cell_formats' in metadata:
+            return metadata['cell_formats']
 
+        fmt_df = metadata['fmt_df']
+        if 'formats' in metadata:
+            codes, formats = fmt_df.to_numpy(), metadata['formats']
+        else:
+            codes, formats = np.arange(fmt_df.size).reshape(fmt_df.shape), fmt_df.to_numpy().ravel().tolist()
+        return CellFormats.from_formats(codes, formats, metadata.get('col_widths'))
+
+    def _data_formats(self, n_rows):
+        '''CellFormats of the n_rows data rows'''
+        formats = self._cell_formats(self._metadata)
+        return formats.rows(formats.shape[0] - n_rows)  # Drop header row, if used as column names
+
+    def _gsheet_formatting(self, df, formats, color_ids=None):
+        '''Prefixes the cells of the rendered DataFrame with their background colour,
+        referring to the colours named by _table_colors. A row of a single colour gets
+        a rowcolor command, otherwise each coloured cell a cellcolor command.'''
+        if color_ids is None:
+            color_ids, _ = self._table_colors(formats)
+        names = np.array(['%s%d' % (self._COLOR_PREFIX, i) for i in range(color_ids.max(initial=-1) + 1)] + [''],
+                         dtype=object)  # -1 (white) selects the empty name
+        cellcolor = np.where(color_ids >= 0, '\\cellcolor{' + names[color_ids] + '} ', '').astype(object)
+
+        prefix = cellcolor[formats.codes]
+        if formats.shape[1]:
+            cell_ids = color_ids[formats.codes]
+            single = np.all(cell_ids == cell_ids[:, :1], axis=1) & (cell_ids[:, 0] >= 0)
+            prefix[single] = ''
+            prefix[single, 0] = '\\rowcolor{' + names[cell_ids[single, 0]] + '} '
+
+        return pd.DataFrame(prefix + df.to_numpy(dtype=object), index=df.index, columns=df.columns)
+
+
+    def _sub_table(self, lines):
+        '''Escapes the wrapped lines of a cell, and stacks them in a sub-table if there
+        is more than one'''
+        sub_table = '\\\\'.join(self._fix_chars(line) for line in lines)
+        if len(lines) > 1:
+            sub_table = '\\begin{tabular}[c]{@{}c@{}}' + sub_table + '\\end{tabular}'
         return sub_table
 
-
     def group_table_rows(self, fname):
         '''Applies \tableskip vertical space between rows in table.
 
@@ -153,27 +259,157 @@ class LatexPandas():
         with open(fname, 'r') as fin:
             lines = fin.readlines()
 
-        tabletop = [i for i, s in enumerate(lines) if 'toprule' in s][0]
-        for i, line in enumerate(lines):
-            if i > tabletop:
-                if '\\bottomrule' in line:
-                    break
-                else:
-                    lines[i] = line + '\\addlinespace[\\tableskip]\n'
+        self._write_lines(fname, self._group_lines(lines))
 
-        with open(fname, 'w') as fout:
-            fout.writelines(lines)
+    # Vertical space appended to the data rows by group_rows
+    _ROW_SKIP = '\\addlinespace[\\tableskip]\n'
 
+    @classmethod
+    def _group_lines(cls, lines):
+        '''Adds \\addlinespace after the data rows of a table file. The rows start after the
+        last \\endhead or \\endlastfoot of a longtable, otherwise after the \\midrule below
+        the header, and end at \\bottomrule or the end of the table environment. Rows
+        already followed by the space are left as is, so grouping twice changes nothing.'''
+        start = None
+        for i, line in enumerate(lines):
+            if line.startswith(('\\endhead', '\\endlastfoot')):
+                start = i + 1
+        if start is None:
+            top = next((i for i, line in enumerate(lines) if line.startswith('\\toprule')), None)
+            if top is None:
+                return lines
+            start = next((i + 1 for i, line in enumerate(lines[top:], top) if line.startswith('\\midrule')), top + 1)
+
+        for i in range(start, len(lines)):
+            line = lines[i]
+            if line.startswith(('\\bottomrule', '\\end{')):
+                break
+            if line.endswith(cls._ROW_SKIP) or (i + 1 < len(lines) and lines[i + 1] == cls._ROW_SKIP):
+                continue
+            lines[i] += cls._ROW_SKIP
+        return lines
+
+    @classmethod
+    def _write_lines(cls, fname, lines, content_hash=None):
+        '''Writes lines to fname in a single write, replacing the file atomically'''
+        with cls._atomic_open(fname, content_hash) as fout:
+            fout.write(''.join(lines))
+
+    @classmethod
+    @contextmanager
+    def _atomic_open(cls, fname, content_hash=None):
+        '''Opens a temporary file for writing, which replaces fname once closed. An
+        identical fname is left untouched, keeping its modification time for LaTeX
+        build tools. content_hash is written as the first line, see gen_tex_table.'''
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(fname)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fout:
+                if content_hash:
+                    fout.write(cls._HASH_COMMENT + content_hash + '\n')
+                yield fout
+            if os.path.isfile(fname) and filecmp.cmp(tmp_path, fname, shallow=False):
+                os.remove(tmp_path)
+                return
+            # mkstemp creates the file private, keep the mode of fname or give the one open() would
+            try:
+                mode = stat.S_IMODE(os.stat(fname).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, fname)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def _content_hash(self, fname, options):
+        '''Hash of everything the table in fname is generated from: the DataFrame, the
+        metadata, the formatting settings and the gen_tex_table options'''
+        h = hashlib.sha1(repr((self._RENDER_VERSION, ntpath.basename(fname), sorted(options.items()),
+                               self._max_col_width, self._float_format)).encode())
+
+        df = self._source
+        h.update(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        except TypeError:  # unhashable cells, ie. lists
+            h.update(pickle.dumps(df, protocol=4))
 
-    def gen_tex_table(self, fname, caption, label=None, col_form='lcr', header=True, small=True, longtable=True):
         if self._metadata:
-            self._gen_tex_table_v2(fname, caption, label, col_form, header, small, longtable)
-        else:
-            self._gen_tex_table_v1(fname, caption, label, col_form, header)
+            formats = self._cell_formats(self._metadata)
+            for array in (formats.codes, formats.background, formats.h_align, formats.bold, formats.italic,
+                          formats.font_size):
+                h.update(np.ascontiguousarray(array).tobytes())
+            h.update(repr((formats.shape, formats.col_widths)).encode())
+
+        return h.hexdigest()
+
+    @classmethod
+    def _stored_hash(cls, fname):
+        '''Content hash in the first line of fname, None if it has none'''
+        try:
+            with open(fname) as fin:
+                line = fin.readline()
+        except OSError:
+            return None
+        return line[len(cls._HASH_COMMENT):].strip() if line.startswith(cls._HASH_COMMENT) else None
+
 
+    # First line of tables generated incrementally. Bump _RENDER_VERSION when the output changes
+    _HASH_COMMENT = '% LatexPandas content hash: '
+    _RENDER_VERSION = 3
 
-    def _gen_tex_table_v1(self, fname, caption, label=None, col_form='lcr', header=True):
-        '''Save pandas dataframe to *.tex file, for direct usage in LaTeX report
+    # Prefix of the names of the background colours defined by a table
+    _COLOR_PREFIX = 'lpc'
+
+    # render_many spec keys passed to the constructor, the others go to gen_tex_table
+    _INIT_KEYS = ('dataframe', 'metadata', 'col_width', 'float_format')
+
+    @classmethod
+    def render_many(cls, specs, workers=None) -> dict:
+        '''Save many tables to *.tex files, generated in parallel by a pool of processes.
+        A failing table does not stop the others.
+
+        Parameters
+        ----------
+        specs: list of dict
+            One dict per table, holding the LatexPandas arguments (dataframe, metadata,
+            col_width, float_format) and the gen_tex_table arguments (fname, caption, ...)
+        workers: int, optional
+            Number of processes, defaults to the number of CPUs. With 1, the tables are
+            generated in this process
+
+        Returns
+        -------
+        dict of fname: exception for the tables that could not be generated
+        '''
+        fnames = [spec['fname'] for spec in specs]
+        if len(set(fnames)) != len(fnames):
+            raise ValueError('Each table must be saved to a different file')
+
+        errors = {}
+        if workers == 1:
+            for spec in specs:
+                error = _render_spec(cls, spec)
+                if error is not None:
+                    errors[spec['fname']] = error
+            return errors
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_render_spec, cls, spec) for spec in specs]
+            for fname, future in zip(fnames, futures):
+                try:
+                    error = future.result()
+                except Exception as e:  # ie. unpicklable spec or a crashed worker
+                    error = e
+                if error is not None:
+                    errors[fname] = error
+
+        return errors
+
+    def gen_tex_table(self, fname, caption, label=None, col_form='lcr', header=True, small=True, longtable=True,
+                      group_rows=False, chunksize=None, incremental=False, template=None) -> bool:
+        '''Save table to *.tex file, for direct usage in LaTeX report. The rows are
+        formatted directly into the table template and written in a single pass.
 
         Parameters
         ----------
@@ -185,123 +421,128 @@ class LatexPandas():
             Latex table label for references. ie: 'tab:my-table'
         col_form: str, default 'lcr'
             Alignment pattern of columns. Default will center all middle columns,
-            left-align leftmost column, and right-align rightmost column
+            left-align leftmost column, and right-align rightmost column. Ignored if
+            metadata is given, the sheet column widths and alignment are used instead.
         header: bool, default True
             Include column names
+        small: bool, default True
+            Use small font, for the longtable and tabularx templates
+        longtable: bool, default True
+            Unused, kept for compatibility. See template
+        group_rows: bool, default False
+            Apply \\tableskip vertical space after each data row, as group_table_rows does
+        chunksize: int, optional
+            Render and write the rows in chunks of this many rows, keeping memory use flat
+            for very large tables. Always used if the table was created from an iterator
+            of DataFrames, which is consumed per DataFrame
+        incremental: bool, default False
+            Store a hash of the DataFrame, metadata and options in the first line of fname,
+            and skip generating the table if fname holds the same hash. Not available for
+            an iterator of DataFrames.
+        template: str or TableTemplate, optional
+            Table layout, a name of latex_templates.TEMPLATES ('table', 'longtable',
+            'tabularx', 'booktabs' or a registered template). Defaults to 'longtable' with
+            metadata or chunks, otherwise 'table'
 
         Returns
         -------
-        *.tex file containing table data
-
-        '''
-        self._df = self._df.applymap(self._make_sub_table)
-        if label is None:
-            label = 'tab:'+caption.replace(' ', '')[:10]
-
-        if col_form == 'lcr':
-            col_form = 'l' + 'c' * len(self._df.columns) + 'r'
-        elif len(col_form) == 1:
-            col_form = col_form*len(self._df.columns)
-
-        comment_header = '% ---- Generated using LuigiPyTools.LatexPandas module ---- \n\n\n% Include the following line in preamble' \
-                         ' to specify space between grouped rows in tables \n% \\newcommand{\\tableskip}{5pt} \n\n% To' \
-                         ' include this table, use at the desired location in the document: \n' \
-                         '% \\input{'+ntpath.basename(fname)+'}\n\n'
-
-        with open(fname, 'w') as tf:
-            with pd.option_context("max_colwidth", 1000):
-                tf.write(comment_header)
-                tf.write('\\begin{table}[H]\n\\centering \n\\caption{'+caption+'}\\label{'+label+'} \n')
-                tf.write('\\resizebox{\\textwidth}{!}{\n')
-                tf.write(self._df.to_latex(float_format="%.3f", escape=False, index=False,
-                                           column_format=col_form, header=header))
-                tf.write('}\n\\end{table}')
-
-
-    def _gen_tex_table_v2(self, fname, caption, label=None, col_form='lcr', header=True, small=True, longtable=True):
-        '''
-        Allows longtable to be used.
-        Args:
-            fname:
-            caption:
-            label:
-            col_form:
-            header:
-            small:
-            longtable:
-
-        Returns:
-
+        bool, False if the table was skipped as unchanged
         '''
-        comment_header = '% ---- Generated using LuigiPyTools.LatexPandas module ---- ' \
-                         '\n\n\n% Include the following lines in preamble:' \
-                         '\n% \\usepackage{array}' \
-                         '\n% \\usepackage{ragged2e}' \
-                         '\n% \\usepackage{xcolor, colortbl}' \
-                         '\n% \\usepackage{booktabs}' \
-                         '\n% \\usepackage{longtable}' \
-                         '\n% \\usepackage[font=small,textfont=it,labelfont=bf]{caption}' \
-                         '\n\n% \\newcolumntype{L}[1]{>{\\raggedright\\arraybackslash}p{#1}}' \
-                         '\n% \\newcolumntype{C}[1]{>{\\centering\\arraybackslash}p{#1}}' \
-                         '\n% \\newcolumntype{R}[1]{>{\\raggedleft\\arraybackslash}p{#1}}' \
-                         '\n% \\captionsetup{justification = centering}' \
-                         '\n% \\newcommand{\\tableskip}{5pt}' \
-                         '\n\n% To include this table, use at the desired location in the document: ' \
-                         '\n% \\input{' + ntpath.basename(fname) + '}\n\n'
-
-
-        if label is None:
-            label = 'tab:'+caption.replace(' ', '')[:10]
-
-        if col_form == 'lcr':
-            col_form = 'l' + 'c' * len(self._df.columns) + 'r'
-        elif len(col_form) == 1 or len(col_form) != len(self._df.columns):
-            col_form = col_form * len(self._df.columns)
-        # col_form = self._tex_col_format_metadata(col_form)
-
-
-        if self._metadata:
-            longtable = True # use longtable on when col width data is given
-            col_form = self._tex_col_format_metadata(self._metadata)
-
-        with open(fname, 'w') as tf:
-            with pd.option_context("max_colwidth", 1000):
-                tf.write(comment_header)
-                if not longtable:
-                    tf.write('\\begin{table}[H]\n')
-                    if small:
-                        tf.write('\\small\n')
-
-                    tf.write('\\centering \n\\caption{' + caption + '}\\label{' + label + '} \n')
-                tf.write(self._df.to_latex(float_format="%.3f", escape=False, index=False,
-                                           column_format=col_form, header=header, longtable=longtable))
-                if not longtable:
-                    tf.write('\\end{table}')
-
-        if longtable:
-            self._longtable_modify(fname, caption, label, small=small)
-
-
-    def _longtable_modify(self, fname, caption, label, small):
-        with open(fname, 'r') as fin:
-            lines = fin.readlines()
-
-        for i, line in enumerate(lines):
-            if '\\begin{longtable}' in line:
-                if small:
-                    line = '\\begin{small}\n' + line
-                line = line.replace('{longtable}', '{longtable}[H]')
-                line += '\\caption{' + caption + '}\\label{' + label + '}\\\\ \n'
-            if '\\end{longtable}' in line:
-                line = '\\bottomrule\n' + line
-                if small:
-                    line += '\\end{small}'
-            lines[i] = line
-
-        with open(fname, 'w') as fout:
-            fout.writelines(lines)
-
-
-
-
-
+        with metrics.stage('gen_tex_table', file=ntpath.basename(fname)) as info:
+            stream = chunksize or not isinstance(self._source, pd.DataFrame)
+            if template is None:
+                template = 'longtable' if self._metadata or stream else 'table'
+            if isinstance(template, str):
+                template = TEMPLATES[template]
+
+            content_hash = None
+            if incremental and isinstance(self._source, pd.DataFrame):
+                # The compiled segments, so that an edited or re-registered template regenerates
+                options = {'caption': caption, 'label': label, 'col_form': col_form, 'header': header, 'small': small,
+                           'group_rows': group_rows, 'chunksize': chunksize,
+                           'template': (template.head, template.foot)}
+                content_hash = self._content_hash(fname, options)
+                if self._stored_hash(fname) == content_hash:
+                    info['skipped'] = True
+                    return False
+
+            if isinstance(self._source, pd.DataFrame):
+                chunksize = chunksize or max(len(self._source), 1)
+                chunks = (self._source.iloc[i:i + chunksize] for i in range(0, max(len(self._source), 1), chunksize))
+                formats = self._data_formats(len(self._source)) if self._metadata else None
+            elif self._metadata:
+                raise ValueError('Metadata can only be applied to a DataFrame, not to an iterator of DataFrames')
+            else:
+                chunks = iter(self._source)
+                formats = None
+
+            try:
+                first = next(chunks)
+            except StopIteration:
+                raise ValueError('No DataFrames to write, the iterator is empty or was consumed by an earlier '
+                                 'gen_tex_table call') from None
+            n_cols = first.shape[1]
+            if label is None:
+                label = 'tab:'+caption.replace(' ', '')[:10]
+
+            if self._metadata:
+                col_form = self._tex_col_format_metadata(self._metadata).rstrip()
+            elif col_form == 'lcr':
+                col_form = 'l' + 'c' * n_cols + 'r'
+            elif len(col_form) == 1:
+                col_form = col_form * n_cols
+
+            head, foot = template.render(input=ntpath.basename(fname), caption=caption, label=label,
+                                         col_form=col_form, n_cols=n_cols,
+                                         header=self._tex_row(first.columns) if header else '',
+                                         small='\\small\n' if small else '',
+                                         small_begin='\\begin{small}\n' if small else '',
+                                         small_end='\\end{small}' if small else '')
+            head = io.StringIO(head).readlines()
+            foot = io.StringIO(foot).readlines()
+
+            color_ids = None
+            if formats is not None:
+                # Colours are defined once, ahead of the table body
+                color_ids, definitions = self._table_colors(formats)
+                body = next((i for i, line in enumerate(head) if line.startswith('\\')), len(head))
+                head[body:body] = definitions
+
+            with self._atomic_open(fname, content_hash) as tf:
+                tf.writelines(head)
+
+                start = 0
+                for chunk in itertools.chain([first], chunks):
+                    chunk_formats = None if formats is None else formats.rows(start, start + len(chunk))
+                    with metrics.stage('render', rows=len(chunk), cells=chunk.size, wrap=formats is None):
+                        rendered = self._render_frame(wrap=formats is None, source=chunk, formats=chunk_formats,
+                                                      color_ids=color_ids)
+                        rows = map(self._tex_row, rendered.to_numpy(dtype=object).tolist())
+                        if group_rows:
+                            rows = (row + self._ROW_SKIP for row in rows)
+                        rows = list(rows)
+                    with metrics.stage('write', rows=len(rows)):
+                        tf.writelines(rows)
+                    start += len(chunk)
+
+                tf.writelines(foot)
+
+            info['rows'] = start
+            info['cells'] = start * n_cols
+            return True
+
+    @staticmethod
+    def _tex_row(cells):
+        '''Table row of the cell strings'''
+        return ' & '.join(map(str, cells)) + ' \\\\\n'
+
+
+def _render_spec(cls, spec):
+    '''Generates a single table of LatexPandas.render_many, returns the exception if it fails'''
+    try:
+        init_kwargs = {key: value for key, value in spec.items() if key in cls._INIT_KEYS}
+        gen_kwargs = {key: value for key, value in spec.items() if key not in cls._INIT_KEYS}
+        cls(**init_kwargs).gen_tex_table(**gen_kwargs)
+    except Exception as e:
+        return e
+    return None
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: latex_templates
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+
+Table layouts of LatexPandas. Templates use string.Template placeholders, ie. $caption
+or ${header}; write a literal $ as $$. Available fields:
+    input        file name, for the \\input hint
+    caption      table caption
+    label        table label
+    col_form     column format
+    n_cols       number of columns
+    header       header row, empty without header
+    small        '\\small' line, empty if not small
+    small_begin  '\\begin{small}' line, empty if not small
+    small_end    '\\end{small}', empty if not small
+
+"""
+import string
+
+
+class TableTemplate():
+    '''
+    Description
+    -----------
+    LaTeX table layout, split into the text before the rows (head) and after the rows
+    (foot). The template text is compiled once into literal and field segments, so
+    rendering a table only joins strings.
+
+    '''
+    def __init__(self, head, foot):
+        '''
+
+        Parameters
+        ----------
+        head: str
+            Template of everything before the table rows
+        foot: str
+            Template of everything after the table rows
+        '''
+        self.head = self._compile(head)
+        self.foot = self._compile(foot)
+
+    @staticmethod
+    def _compile(text):
+        '''Splits template text into (literal, field name) segments'''
+        segments = []
+        pos = 0
+        for match in string.Template.pattern.finditer(text):
+            literal = text[pos:match.start()]
+            name = match.group('named') or match.group('braced')
+            if match.group('escaped') is not None:
+                literal += '$'
+            elif name is None:
+                raise ValueError(f'Invalid placeholder in template at position {match.start()}')
+            segments.append((literal, name))
+            pos = match.end()
+        segments.append((text[pos:], None))
+        return tuple(segments)
+
+    @staticmethod
+    def _substitute(segments, fields):
+        return ''.join(literal if name is None else literal + str(fields[name]) for literal, name in segments)
+
+    def render(self, **fields) -> tuple:
+        '''Returns the head and foot of a table, with the fields filled in'''
+        return self._substitute(self.head, fields), self._substitute(self.foot, fields)
+
+
+_GENERATED = '% ---- Generated using LuigiPyTools.LatexPandas module ---- \n\n\n'
+_INPUT = '% To include this table, use at the desired location in the document: \n% \\input{$input}\n\n'
+
+_TABLESKIP_COMMENT = _GENERATED + \
+    '% Include the following line in preamble to specify space between grouped rows in tables \n' \
+    '% \\newcommand{\\tableskip}{5pt} \n\n' + _INPUT
+
+_LONGTABLE_COMMENT = _GENERATED + \
+    '% Include the following lines in preamble:' \
+    '\n% \\usepackage{array}' \
+    '\n% \\usepackage{ragged2e}' \
+    '\n% \\usepackage{xcolor, colortbl}' \
+    '\n% \\usepackage{booktabs}' \
+    '\n% \\usepackage{longtable}' \
+    '\n% \\usepackage[font=small,textfont=it,labelfont=bf]{caption}' \
+    '\n\n% \\newcolumntype{L}[1]{>{\\raggedright\\arraybackslash}p{#1}}' \
+    '\n% \\newcolumntype{C}[1]{>{\\centering\\arraybackslash}p{#1}}' \
+    '\n% \\newcolumntype{R}[1]{>{\\raggedleft\\arraybackslash}p{#1}}' \
+    '\n% \\captionsetup{justification = centering}' \
+    '\n% \\newcommand{\\tableskip}{5pt}' \
+    '\n\n' + _INPUT
+
+_TABULARX_COMMENT = _GENERATED + \
+    '% Include the following lines in preamble:' \
+    '\n% \\usepackage{booktabs}' \
+    '\n% \\usepackage{tabularx}' \
+    '\n% \\newcommand{\\tableskip}{5pt}' \
+    '\n\n' + _INPUT
+
+_RULES_HEAD = '\\toprule\n${header}\\midrule\n'
+
+TEMPLATES = {
+    # Tabular scaled to the text width in a table float
+    'table': TableTemplate(_TABLESKIP_COMMENT + '\\begin{table}[H]\n\\centering \n'
+                           '\\caption{$caption}\\label{$label} \n\\resizebox{\\textwidth}{!}{\n'
+                           '\\begin{tabular}{$col_form}\n' + _RULES_HEAD,
+                           '\\bottomrule\n\\end{tabular}\n}\n\\end{table}'),
+    # Table over multiple pages, repeating the header
+    'longtable': TableTemplate(_LONGTABLE_COMMENT + '${small_begin}\\begin{longtable}[H]{$col_form}\n'
+                               '\\caption{$caption}\\label{$label}\\\\ \n' + _RULES_HEAD + '\\endfirsthead\n' +
+                               _RULES_HEAD + '\\endhead\n\\midrule\n'
+                               '\\multicolumn{$n_cols}{r}{Continued on next page} \\\\\n\\midrule\n\\endfoot\n'
+                               '\\bottomrule\n\\endlastfoot\n',
+                               '\\end{longtable}\n${small_end}'),
+    # Table float of the text width, with X columns stretching to fill it
+    'tabularx': TableTemplate(_TABULARX_COMMENT + '\\begin{table}[H]\n${small}\\centering \n'
+                              '\\caption{$caption}\\label{$label} \n'
+                              '\\begin{tabularx}{\\textwidth}{$col_form}\n' + _RULES_HEAD,
+                              '\\bottomrule\n\\end{tabularx}\n\\end{table}\n'),
+    # Bare booktabs tabular, to be placed in a float by the document
+    'booktabs': TableTemplate(_GENERATED + _INPUT + '\\begin{tabular}{$col_form}\n' + _RULES_HEAD,
+                              '\\bottomrule\n\\end{tabular}\n'),
+}
+
+
+def register_template(name, template):
+    '''Makes a TableTemplate available to LatexPandas.gen_tex_table by name
+
+    Parameters
+    ----------
+    name: str
+        Template name
+    template: TableTemplate
+        Table layout
+    '''
+    if not isinstance(template, TableTemplate):
+        raise TypeError('template must be a TableTemplate')
+    TEMPLATES[name] = template
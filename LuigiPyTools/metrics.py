@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: metrics
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+
+Stage timings and counters of the Google api and LaTeX pipeline. Every instrumented
+stage reports an event dict to the registered hooks, eg.
+    {'stage': 'http', 'duration_s': 0.21, 'bytes': 48213, 'status': 200}
+Without hooks, stages cost a single check, so the instrumentation can stay enabled.
+
+    with Profiler() as prof:
+        df, metadata = sheets.get_spreadsheet(sheet_id, 'Sheet1!A1:H40')
+        LatexPandas(df, metadata).gen_tex_table('table.tex', 'Budget')
+    print(prof.report())
+
+"""
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+# Registered hooks, replaced rather than modified so that emitting needs no lock
+_HOOKS = ()
+_HOOKS_LOCK = threading.Lock()
+
+
+class _Discard(dict):
+    '''Fields of a stage while no hooks are registered, assignments are dropped'''
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+_NO_STAGE = nullcontext(_Discard())
+
+# Numeric fields that identify an event rather than count, not summed by Profiler
+_NOT_SUMMED = frozenset(['status'])
+
+
+def add_hook(hook):
+    '''Registers hook, called with the event dict of every stage and counter, from the
+    thread that ran the stage. Hooks must be fast and must not raise.'''
+    global _HOOKS
+    with _HOOKS_LOCK:
+        _HOOKS = _HOOKS + (hook,)
+
+
+def remove_hook(hook):
+    '''Unregisters a hook added with add_hook'''
+    global _HOOKS
+    with _HOOKS_LOCK:
+        hooks = list(_HOOKS)
+        hooks.remove(hook)
+        _HOOKS = tuple(hooks)
+
+
+def enabled() -> bool:
+    '''Whether any hook is registered'''
+    return bool(_HOOKS)
+
+
+def emit(name, **fields):
+    '''Reports an event without duration, ie. a cache hit'''
+    if not _HOOKS:
+        return
+    fields['stage'] = name
+    for hook in _HOOKS:
+        hook(fields)
+
+
+def stage(name, **fields):
+    '''Context manager timing a stage. It yields the dict of event fields, to which
+    results such as byte or cell counts can be added. A stage that raises reports the
+    name of the exception as 'error'.
+
+    Parameters
+    ----------
+    name: str
+        Name of the stage, eg. 'http' or 'render'
+    fields:
+        Fields added to the event
+    '''
+    if not _HOOKS:
+        return _NO_STAGE
+    return _timed_stage(name, fields)
+
+
+@contextmanager
+def _timed_stage(name, fields):
+    start = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        fields['error'] = type(e).__name__
+        raise
+    finally:
+        fields['duration_s'] = time.perf_counter() - start
+        emit(name, **fields)
+
+
+class Profiler():
+    '''
+    Description
+    -----------
+    Hook collecting the events of all stages while used as a context manager, and
+    summarizing them per stage
+
+    '''
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self):
+        add_hook(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_hook(self)
+
+    def summary(self) -> dict:
+        '''
+        Totals per stage, in the order the stages first finished
+
+        Returns
+        -------
+        dict of stage: dict with 'count', 'total_s', 'mean_s' and 'max_s' for timed
+        stages, and the sums of all other numeric fields, ie. 'bytes' or 'cells', except
+        the http 'status'
+        '''
+        with self._lock:
+            events = list(self.events)
+
+        summary = {}
+        for event in events:
+            totals = summary.setdefault(event['stage'], {'count': 0})
+            totals['count'] += 1
+            for key, value in event.items():
+                if key == 'duration_s':
+                    totals['total_s'] = totals.get('total_s', 0.) + value
+                    totals['max_s'] = max(totals.get('max_s', 0.), value)
+                elif isinstance(value, (int, float)) and key not in _NOT_SUMMED:  # bools count the events where they are True
+                    totals[key] = totals.get(key, 0) + value
+
+        for totals in summary.values():
+            if 'total_s' in totals:
+                totals['mean_s'] = totals['total_s'] / totals['count']
+        return summary
+
+    def report(self) -> str:
+        '''Summary as a text table, one line per stage'''
+        lines = [f"{'stage':24s} {'count':>7s} {'total ms':>10s} {'mean ms':>10s} {'max ms':>10s}  totals"]
+        for name, totals in self.summary().items():
+            timing = [f"{totals[key] * 1e3:10.2f}" if key in totals else f"{'':10s}"
+                      for key in ('total_s', 'mean_s', 'max_s')]
+            others = ', '.join(f'{key}={value:g}' for key, value in totals.items()
+                               if key not in ('count', 'total_s', 'mean_s', 'max_s'))
+            lines.append(f"{name:24s} {totals['count']:7d} {' '.join(timing)}  {others}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def profile(output=None):
+    '''Profiles the stages run within the context, yielding the Profiler
+
+    Parameters
+    ----------
+    output: callable, optional
+        Called with the report once the context exits, eg. print
+    '''
+    with Profiler() as profiler:
+        yield profiler
+    if output is not None:
+        output(profiler.report())
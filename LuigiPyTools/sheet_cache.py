@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: sheet_cache
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+
+
+class SheetCache():
+    '''
+    Description
+    -----------
+    Directory store of parsed spreadsheet ranges, evicting the least recently used
+    entries once the total size exceeds max_bytes. Each entry file holds a small
+    header (key, modification time of the spreadsheet, time stored) followed by the
+    cached value, so validity can be checked without loading the value.
+
+    '''
+    def __init__(self, cache_dir, max_bytes=512 * 2**20):
+        '''
+
+        Parameters
+        ----------
+        cache_dir: str
+            Directory of the cache files. Created if it does not exist.
+        max_bytes: int, default 512 MiB
+            Maximum total size of the cache files
+        '''
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(repr(key).encode()).hexdigest() + '.pkl')
+
+    def header(self, key):
+        '''Header dict of the entry ('key', 'modified', 'stored'), None if not cached'''
+        try:
+            with open(self._path(key), 'rb') as f:
+                header = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return header if header['key'] == key else None
+
+    def load(self, key):
+        '''Cached value, None if not cached. Marks the entry as recently used.'''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header = pickle.load(f)
+                if header['key'] != key:
+                    return None
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value
+
+    def put(self, key, value, modified=None):
+        '''Stores value, replacing the entry atomically, and evicts old entries
+
+        Parameters
+        ----------
+        key: tuple
+            Entry key, must have a stable repr
+        value:
+            Picklable value
+        modified: str, optional
+            Modification time of the spreadsheet the value was retrieved from
+        '''
+        header = {'key': key, 'modified': modified, 'stored': time.time()}
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        '''Removes least recently used entries until the cache fits max_bytes'''
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        '''Removes all entries'''
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.pkl'):
+                os.remove(entry.path)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: text_wrap
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+@lru_cache(maxsize=8192)
+def wrap_text(text, width) -> tuple:
+    '''Greedy word wrap of text to lines of at most width characters
+
+    Existing line breaks are kept. A word longer than width is put on a line of its
+    own rather than split. Results are memoized, cell text is often repeated.
+
+    Parameters
+    ----------
+    text: str
+        Text to wrap
+    width: int
+        Maximum line width, in characters
+
+    Returns
+    -------
+    tuple of str, the lines
+    '''
+    lines = []
+    for paragraph in text.split('\n'):
+        if len(paragraph) <= width:
+            lines.append(paragraph)
+            continue
+
+        line = []
+        length = -1
+        for word in paragraph.split():
+            if line and length + 1 + len(word) > width:
+                lines.append(' '.join(line))
+                line = []
+                length = -1
+            line.append(word)
+            length += 1 + len(word)
+        lines.append(' '.join(line))
+
+    return tuple(lines)
+
+
+def wrap_column(col, width, formatter='\n'.join) -> pd.Series:
+    '''Wrap all strings of a column, each unique value only once
+
+    Parameters
+    ----------
+    col: pd.Series
+        Column of strings
+    width: int
+        Maximum line width, in characters
+    formatter: callable, default '\\n'.join
+        Converts the tuple of wrapped lines to the cell value
+
+    Returns
+    -------
+    pd.Series with the formatted values, same index as col
+    '''
+    codes, uniques = pd.factorize(col)  # Strings only, no missing values
+    wrapped = np.empty(len(uniques), dtype=object)
+    for i, text in enumerate(uniques):
+        wrapped[i] = formatter(wrap_text(text, width))
+    return pd.Series(wrapped[codes], index=col.index, name=col.name)
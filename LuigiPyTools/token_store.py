@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: token_store
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+import json
+import os
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+
+if os.name == 'nt':
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after 10 s
+                return
+            except OSError:
+                pass
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# One store per token file in this process, sharing the credentials in memory
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+class TokenStore():
+    '''
+    Description
+    -----------
+    Token file of the OAuth credentials, shared safely by all threads and processes
+    using it. The file is JSON, written with an atomic replace, so readers never see
+    a partial file. Refreshing and authorizing are done by one thread or process at
+    a time, under a file lock; the others wait and pick up the stored result. Valid
+    credentials are kept in memory and served without reading the file.
+
+    Use TokenStore.open, which returns the same store for a file within a process.
+
+    '''
+    def __init__(self, path, legacy_path=None):
+        '''
+
+        Parameters
+        ----------
+        path: str
+            Token file, eg. 'auth/token.json'
+        legacy_path: str, optional
+            Pickled token file of older versions, converted to path if path does not
+            exist yet, and removed
+        '''
+        self.path = path
+        self.legacy_path = legacy_path
+        self._lock_path = path + '.lock'
+        self._thread_lock = threading.Lock()
+        self._creds = None
+
+    @classmethod
+    def open(cls, path, legacy_path=None):
+        '''Store of the token file path, shared within the process'''
+        path = os.path.abspath(path)
+        with _STORES_LOCK:
+            store = _STORES.get(path)
+            if store is None:
+                store = _STORES[path] = cls(path, legacy_path)
+        return store
+
+    @contextmanager
+    def lock(self):
+        '''Exclusive access to the token file, across threads and processes'''
+        with self._thread_lock:
+            with open(self._lock_path, 'a+') as f:
+                _lock_file(f)
+                try:
+                    yield
+                finally:
+                    _unlock_file(f)
+
+    def load(self, client_id=None, scopes=None):
+        '''
+        Stored credentials, None if there are none, they belong to another client or
+        lack some of the scopes
+
+        Parameters
+        ----------
+        client_id: str, optional
+            OAuth client id the credentials must have been issued to
+        scopes: list of str, optional
+            Scopes the credentials must have been granted
+        '''
+        from google.oauth2.credentials import Credentials
+
+        try:
+            with open(self.path) as f:
+                creds = Credentials.from_authorized_user_info(json.load(f))
+        except (OSError, ValueError):  # Missing, unreadable or incomplete token
+            return None
+        return creds if self._usable(creds, client_id, scopes) else None
+
+    @staticmethod
+    def _usable(creds, client_id, scopes):
+        '''Whether creds were issued to client_id and hold all scopes'''
+        if creds is None:
+            return False
+        if client_id is not None and creds.client_id != client_id:
+            return False
+        return not scopes or creds.has_scopes(scopes)
+
+    def save(self, creds):
+        '''Stores credentials, replacing the token file atomically'''
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')  # Private to the user
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(creds.to_json())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self._creds = creds
+
+    def credentials(self, authorize, client_id=None, creds=None, scopes=None):
+        '''
+        Valid credentials. Served from memory or the token file while valid, otherwise
+        refreshed, or authorized if they cannot be refreshed, and stored.
+
+        Parameters
+        ----------
+        authorize: callable
+            Runs the authorization flow, returning new credentials
+        client_id: str, optional
+            OAuth client id the credentials must have been issued to
+        creds: google.oauth2.credentials.Credentials, optional
+            Previously loaded credentials, refreshed if there are no stored ones
+        scopes: list of str, optional
+            Scopes the credentials must hold. Credentials lacking any of them are
+            authorized again, a refresh cannot add scopes.
+        '''
+        cached = self._creds
+        if cached is not None and cached.valid and self._usable(cached, client_id, scopes):
+            return cached
+
+        stored = self.load(client_id, scopes)
+        if stored is not None and stored.valid:
+            self._creds = stored
+            return stored
+
+        with self.lock():
+            # Refreshed meanwhile by another thread or process
+            stored = self.load(client_id, scopes) or self._load_legacy(client_id, scopes)
+            if stored is not None and stored.valid:
+                self._creds = stored
+                return stored
+
+            creds = stored or (creds if self._usable(creds, client_id, scopes) else None)
+            if creds is not None and creds.expired and creds.refresh_token:
+                from google.auth.transport.requests import Request
+                creds.refresh(Request())
+            else:
+                creds = authorize()
+            self.save(creds)
+            return creds
+
+    def _load_legacy(self, client_id, scopes=None):
+        '''Converts the pickled token file of older versions. Caller must hold the lock.'''
+        if self.legacy_path is None or not os.path.exists(self.legacy_path):
+            return None
+        with open(self.legacy_path, 'rb') as f:
+            creds = pickle.load(f)
+        if not self._usable(creds, client_id, scopes):
+            creds = None
+        else:
+            self.save(creds)
+        os.remove(self.legacy_path)
+        return creds
+
+    def clear(self):
+        '''Forgets the credentials held in memory, the token file is kept'''
+        self._creds = None
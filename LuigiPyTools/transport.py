@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: transport
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+import random
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+from LuigiPyTools import metrics
+
+# Responses worth retrying: quota exceeded and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket():
+    '''
+    Description
+    -----------
+    Thread-safe token bucket rate limiter. Allows bursts of up to 'capacity'
+    requests, refilled at 'rate' requests per second.
+
+    '''
+    def __init__(self, rate, capacity=None):
+        '''
+
+        Parameters
+        ----------
+        rate: float
+            Sustained number of requests per second
+        capacity: int, optional
+            Maximum burst size. Defaults to rate, at least 1
+        '''
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        '''Takes a token, returns the time in seconds to wait before it may be used'''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0., -self._tokens / self.rate)
+
+    def acquire(self):
+        '''Blocks until a request may be made'''
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+def retry_after(value):
+    '''Seconds to wait according to a Retry-After header, None if absent or invalid'''
+    if not value:
+        return None
+    try:
+        return max(0., float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0., (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, backoff=0.5, max_backoff=32., retry_after_s=None):
+    '''Exponential backoff with full jitter. A Retry-After delay takes precedence.
+
+    Parameters
+    ----------
+    attempt: int
+        Number of the failed attempt, starting at 0
+    backoff: float, default 0.5
+        Delay cap of the first retry, in seconds. Doubles every attempt
+    max_backoff: float, default 32
+        Maximum delay cap, in seconds
+    retry_after_s: float, optional
+        Delay requested by the server
+    '''
+    if retry_after_s is not None:
+        return retry_after_s
+    return random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+
+class RetryHttp():
+    '''
+    Description
+    -----------
+    Wraps an httplib2 compatible http object, eg. google_auth_httplib2.AuthorizedHttp,
+    adding rate limiting and retries with exponential backoff on quota and server
+    errors. The wrapped object keeps its connections alive between requests.
+
+    '''
+    def __init__(self, http, retries=5, backoff=0.5, max_backoff=32., rate_limiter=None):
+        '''
+
+        Parameters
+        ----------
+        http: httplib2.Http or compatible
+            Transport to wrap
+        retries: int, default 5
+            Maximum number of retries per request
+        backoff: float, default 0.5
+            See backoff_delay
+        max_backoff: float, default 32
+            See backoff_delay
+        rate_limiter: TokenBucket, optional
+            Limits the request rate, possibly shared with other transports
+        '''
+        self.http = http
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiter = rate_limiter
+
+    def __getattr__(self, name):
+        # Expose attributes of the wrapped transport, ie. credentials
+        return getattr(self.http, name)
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        with metrics.stage('http', method=method) as info:
+            resp, content, info['retries'] = self._request(uri, method, body, headers, **kwargs)
+            info['bytes'] = len(content)
+            info['status'] = resp.status
+        return resp, content
+
+    def _request(self, uri, method, body, headers, **kwargs):
+        '''Response, content and the number of retries of a request'''
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                resp, content = self.http.request(uri, method, body=body, headers=headers, **kwargs)
+            except (socket.timeout, ConnectionError):
+                if attempt >= self.retries:
+                    raise
+                delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+            else:
+                if resp.status not in RETRY_STATUSES or attempt >= self.retries:
+                    return resp, content, attempt
+                delay = backoff_delay(attempt, self.backoff, self.max_backoff, retry_after(resp.get('retry-after')))
+
+            time.sleep(delay)
+            attempt += 1
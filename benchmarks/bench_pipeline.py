@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: bench_pipeline
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+
+Offline benchmarks of the sheet parse and LaTeX render pipeline, on synthetic
+includeGridData responses. Writes the timings and peak memory per step to a JSON file:
+    python benchmarks/bench_pipeline.py --rows 2000 --cols 8 --output bench.json
+
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from LuigiPyTools.google_api import GoogleSheets
+from LuigiPyTools.latex_pd import LatexPandas
+from LuigiPyTools.text_wrap import wrap_text
+
+WORDS = ['Provide', 'dry', 'mass,', 'volume', '&', 'geometry', '50%', 'power', 'data', 'attitude', 'thermal',
+         'control', 'link_budget', 'telemetry', 'structure', '#1', 'interface', 'N2']
+
+
+def synthetic_grid(rows, cols, n_formats=10, text_length=40, seed=0):
+    '''Synthetic GridData of a single range, as returned with includeGridData=True
+
+    Parameters
+    ----------
+    rows: int
+        Number of rows, including the header row
+    cols: int
+        Number of columns
+    n_formats: int, default 10
+        Number of distinct cell formats
+    text_length: int, default 40
+        Mean number of characters per cell
+    seed: int, default 0
+        Random seed, the same arguments give the same grid
+    '''
+    rng = random.Random(seed)
+    alignments = ['LEFT', 'CENTER', 'RIGHT']
+    formats = [{'backgroundColor': {'red': round(rng.random(), 7), 'green': round(rng.random(), 7),
+                                    'blue': round(rng.random(), 7)},
+                'horizontalAlignment': alignments[i % 3],
+                'textFormat': {'bold': bool(i % 2), 'fontSize': 10}} for i in range(n_formats)]
+
+    def text():
+        words = []
+        length = rng.randint(1, 2 * text_length)
+        while sum(len(w) + 1 for w in words) < length:
+            words.append(rng.choice(WORDS))
+        return ' '.join(words)
+
+    return {'columnMetadata': [{'pixelSize': rng.randint(50, 300)} for _ in range(cols)],
+            'rowData': [{'values': [{'formattedValue': text(), 'effectiveFormat': dict(rng.choice(formats))}
+                                    for _ in range(cols)]} for _ in range(rows)]}
+
+
+def measure(func, repeat):
+    '''Timings of repeat calls of func, and the peak memory allocated by one call. Every
+    call starts with an empty wrap_text cache, so repeats time the cold path too.'''
+    times = []
+    for _ in range(repeat):
+        wrap_text.cache_clear()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    wrap_text.cache_clear()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'min_s': min(times), 'median_s': statistics.median(times), 'peak_bytes': peak}
+
+
+def run_benchmarks(rows=1000, cols=8, n_formats=10, text_length=40, repeat=5, seed=0) -> dict:
+    '''Runs all pipeline benchmarks, returns the results as a JSON serializable dict'''
+    grid = synthetic_grid(rows, cols, n_formats, text_length, seed)
+    sheets = GoogleSheets.__new__(GoogleSheets)  # Parsing needs no credentials
+    df, metadata = sheets._table_frames(grid, header_row=True)
+    plain = LatexPandas(df)
+    formatted = LatexPandas(df, metadata=metadata)
+    rendered = plain._render_frame()
+    formats = formatted._data_formats(len(df))
+
+    out_dir = tempfile.mkdtemp()
+    table_file = os.path.join(out_dir, 'table.tex')
+
+    benchmarks = {
+        'build_table': lambda: sheets._build_table(grid),
+        'table_frames': lambda: sheets._table_frames(grid, header_row=True),
+        'render_escaped': plain._render_frame,
+        'render_wrapped': lambda: plain._render_frame(wrap=True),
+        'gsheet_formatting': lambda: formatted._gsheet_formatting(rendered, formats),
+        'gen_tex_table_v1': lambda: plain.gen_tex_table(table_file, 'Benchmark', group_rows=True),
+        'gen_tex_table_v2': lambda: formatted.gen_tex_table(table_file, 'Benchmark', group_rows=True),
+        'gen_tex_table_stream': lambda: formatted.gen_tex_table(table_file, 'Benchmark', chunksize=max(rows // 10, 1)),
+    }
+
+    results = {}
+    try:
+        for name, func in benchmarks.items():
+            if os.path.exists(table_file):
+                os.remove(table_file)  # Unchanged files are not rewritten
+            results[name] = measure(func, repeat)
+    finally:
+        for entry in os.scandir(out_dir):
+            os.remove(entry.path)
+        os.rmdir(out_dir)
+
+    return {'params': {'rows': rows, 'cols': cols, 'n_formats': n_formats, 'text_length': text_length,
+                       'repeat': repeat, 'seed': seed},
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'pandas': pd.__version__, 'numpy': np.__version__},
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'results': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=8)
+    parser.add_argument('--formats', type=int, default=10, help='number of distinct cell formats')
+    parser.add_argument('--text-length', type=int, default=40, help='mean characters per cell')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_pipeline.json', help='JSON results file')
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.rows, args.cols, args.formats, args.text_length, args.repeat, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report['results'].items():
+        print(f"{name:22s} {result['median_s'] * 1e3:10.2f} ms {result['peak_bytes'] / 2**20:10.2f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -21,11 +21,15 @@ setup(
     license='LICENSE.txt',
     long_description=open('README.md').read(),
     keywords=['pip', 'lmaiorano', 'pytools'],
+    python_requires='>=3.7',
     install_requires=[
         "google-api-python-client>=1.8.3",
         "google-auth-httplib2>=0.0.3",
         "google-auth-oauthlib>=0.4.1",
         "numpy>=1.18.4",
         "pandas>=1.0.3",
-    ]
+    ],
+    extras_require={
+        "async": ["aiohttp>=3.6"],
+    }
 )
@@ -8,10 +8,14 @@ date: 5/24/2020
 author: lmaio
 """
 
+import json
 import pandas as pd
 import os
 import unittest
+from unittest import mock
 from LuigiPyTools import LatexPandas, GoogleSheets, GoogleCalendar
+from LuigiPyTools.text_wrap import wrap_text, wrap_column
+from LuigiPyTools.latex_templates import TEMPLATES, TableTemplate, register_template
 import filecmp
 import shutil
 
@@ -45,19 +49,247 @@ class BasicPandas(TestLatex):
                            fileout,
                            shallow=False)
 
+    def test_escaping(self):
+        df = pd.DataFrame({'text': ['50% & $5', 'a_b #1 {x} ~^\\', 'C\nD'], 'num': [1.5, None, 3]})
+        LP = LatexPandas(df)
+        rendered = LP._render_frame()
+
+        assert rendered['text'].tolist() == ['50\\% \\& \\$5',
+                                             'a\\_b \\#1 \\{x\\} \\textasciitilde{}\\textasciicircum{}\\textbackslash{}',
+                                             'CD']
+        assert rendered['num'].tolist() == ['1.500', '', '3.000']
+
+    def test_source_unchanged(self):
+        df = pd.DataFrame({'text': ['a & b', None], 'num': [0.25, None], 'count': [1, 2], 'mixed': [1.5, 'x_y'],
+                           'flag': pd.array([True, None], dtype='boolean')})
+        original = df.copy()
+        LP = LatexPandas(df, float_format='%.1f')
+
+        fileout = os.path.join(self.test_output_dir, 'test_unchanged.tex')
+        LP.gen_tex_table(fname=fileout, caption='test_table')
+        with open(fileout) as f:
+            first = f.read()
+        LP.gen_tex_table(fname=fileout, caption='test_table')
+        with open(fileout) as f:
+            assert f.read() == first
+
+        pd.testing.assert_frame_equal(df, original)
+        rendered = LP._render_frame()
+        assert rendered['num'].tolist() == ['0.2', '']
+        assert rendered['count'].tolist() == ['1', '2']
+        assert rendered['mixed'].tolist() == ['1.5', 'x\\_y']
+        assert rendered['flag'].tolist() == ['True', '']
+
+    def test_group_rows(self):
+        df = pd.DataFrame({'a': ['x', 'y'], 'b': [1, 2]})
+        LP = LatexPandas(df)
+
+        grouped = os.path.join(self.test_output_dir, 'grouped.tex')
+        LP.gen_tex_table(fname=grouped, caption='test_table', group_rows=True)
+        separate = os.path.join(self.test_output_dir, 'separate.tex')
+        LP.gen_tex_table(fname=separate, caption='test_table')
+        LP.group_table_rows(separate)
+
+        with open(grouped) as f1, open(separate) as f2:
+            assert f1.read().replace('grouped.tex', 'separate.tex') == f2.read()
+        assert sorted(os.listdir(self.test_output_dir)) == ['grouped.tex', 'separate.tex']  # no temporary files left
+
+    def test_group_longtable_rows(self):
+        df = pd.DataFrame({'a': ['x', 'y'], 'b': [1, 2]})
+        LP = LatexPandas(df)
+
+        grouped = os.path.join(self.test_output_dir, 'grouped.tex')
+        LP.gen_tex_table(fname=grouped, caption='test_table', template='longtable', group_rows=True)
+        separate = os.path.join(self.test_output_dir, 'separate.tex')
+        LP.gen_tex_table(fname=separate, caption='test_table', template='longtable')
+        LP.group_table_rows(separate)
+
+        with open(grouped) as f1, open(separate) as f2:
+            tex = f1.read()
+            assert tex.replace('grouped.tex', 'separate.tex') == f2.read()
+        # Only the data rows are spaced, not the repeated head and foot
+        assert tex.count('\\addlinespace') == 2
+        assert tex.endswith('\\endlastfoot\nx & 1 \\\\\n\\addlinespace[\\tableskip]\n'
+                            'y & 2 \\\\\n\\addlinespace[\\tableskip]\n\\end{longtable}\n\\end{small}')
+
+    def test_group_incremental(self):
+        df = pd.DataFrame({'a': ['x', 'y'], 'b': [1, 2]})
+        fileout = os.path.join(self.test_output_dir, 'grouped_incremental.tex')
+
+        LP = LatexPandas(df)
+        for template in ('table', 'longtable'):
+            LP.gen_tex_table(fileout, 'test_table', incremental=True, template=template)
+            LP.group_table_rows(fileout)
+            with open(fileout) as f:
+                first = f.read()
+            os.utime(fileout, ns=(0, 0))
+
+            # Skipped as unchanged, grouping the grouped file again leaves it untouched
+            assert not LP.gen_tex_table(fileout, 'test_table', incremental=True, template=template)
+            LP.group_table_rows(fileout)
+            with open(fileout) as f:
+                assert f.read() == first
+            assert os.stat(fileout).st_mtime_ns == 0
+            assert first.count('\\addlinespace') == 2
+
+    def test_stream_chunks(self):
+        df = pd.DataFrame({'text': ['a long line of text to wrap', 'b & c', 'd'], 'num': [1., None, 3.]})
+
+        from_frame = os.path.join(self.test_output_dir, 'from_frame.tex')
+        LatexPandas(df, col_width=10).gen_tex_table(fname=from_frame, caption='test_table', chunksize=2)
+        from_chunks = os.path.join(self.test_output_dir, 'from_chunks.tex')
+        LP = LatexPandas(iter([df.iloc[:1], df.iloc[1:]]), col_width=10)
+        LP.gen_tex_table(fname=from_chunks, caption='test_table')
+        with self.assertRaises(ValueError):  # Iterator already consumed
+            LP.gen_tex_table(fname=from_chunks, caption='test_table')
+
+        with open(from_frame) as f1, open(from_chunks) as f2:
+            tex = f1.read()
+            assert tex.replace('from_frame.tex', 'from_chunks.tex') == f2.read()
+        assert '\\begin{tabular}[c]{@{}c@{}}a long\\\\line of\\\\text to\\\\wrap\\end{tabular} & 1.000 \\\\\n' in tex
+        assert 'b \\& c &  \\\\\nd & 3.000 \\\\\n\\end{longtable}' in tex
+        assert tex.count('\\bottomrule') == 1  # In \endlastfoot only
+
+    def test_render_many(self):
+        df = pd.DataFrame({'a': ['x & y', 'z'], 'b': [1, 2]})
+        specs = [{'dataframe': df.iloc[:i], 'fname': os.path.join(self.test_output_dir, f'table_{i}.tex'),
+                  'caption': f'table {i}'} for i in range(1, 3)]
+        specs.append({'dataframe': df, 'fname': os.path.join(self.test_output_dir, 'missing', 'table.tex'),
+                      'caption': 'no directory'})
+
+        errors = LatexPandas.render_many(specs, workers=2)
+
+        assert list(errors) == [specs[2]['fname']]
+        assert isinstance(errors[specs[2]['fname']], OSError)
+        for spec in specs[:2]:
+            serial = spec['fname'].replace('.tex', '_serial.tex')
+            LatexPandas(spec['dataframe']).gen_tex_table(serial, spec['caption'])
+            with open(spec['fname']) as f1, open(serial) as f2:
+                assert f1.read() == f2.read().replace('_serial.tex', '.tex')
+
+    def test_incremental(self):
+        df = pd.DataFrame({'a': ['x', 'y'], 'b': [1.5, 2.5]})
+        fileout = os.path.join(self.test_output_dir, 'incremental.tex')
+
+        assert LatexPandas(df).gen_tex_table(fileout, 'test_table', incremental=True)
+        with open(fileout) as f:
+            assert f.readline().startswith('% LatexPandas content hash: ')
+        os.utime(fileout, ns=(0, 0))
+
+        with mock.patch.object(LatexPandas, '_render_frame') as render:
+            assert not LatexPandas(df.copy()).gen_tex_table(fileout, 'test_table', incremental=True)
+        render.assert_not_called()
+        assert os.stat(fileout).st_mtime_ns == 0
+
+        assert LatexPandas(df).gen_tex_table(fileout, 'other caption', incremental=True)
+        df.loc[1, 'b'] = 3.5
+        assert LatexPandas(df).gen_tex_table(fileout, 'other caption', incremental=True)
+        with open(fileout) as f:
+            assert '3.500' in f.read()
+
+    def test_incremental_template(self):
+        df = pd.DataFrame({'a': ['x', 'y']})
+        fileout = os.path.join(self.test_output_dir, 'incremental_template.tex')
+        head = '\\begin{tabular}{$col_form}\n'
+
+        assert LatexPandas(df).gen_tex_table(fileout, 'test_table', incremental=True,
+                                             template=TableTemplate(head, '\\end{tabular}\n'))
+        # Equal templates are unchanged, whatever object holds them
+        assert not LatexPandas(df).gen_tex_table(fileout, 'test_table', incremental=True,
+                                                 template=TableTemplate(head, '\\end{tabular}\n'))
+
+        register_template('incremental', TableTemplate(head, '\\end{tabular}\n'))
+        self.addCleanup(TEMPLATES.pop, 'incremental')
+        assert not LatexPandas(df).gen_tex_table(fileout, 'test_table', incremental=True, template='incremental')
+        register_template('incremental', TableTemplate(head, '\\bottomrule\n\\end{tabular}\n'))
+        assert LatexPandas(df).gen_tex_table(fileout, 'test_table', incremental=True, template='incremental')
+        with open(fileout) as f:
+            assert f.read().endswith('\\bottomrule\n\\end{tabular}\n')
+
+    def test_unchanged_file_kept(self):
+        df = pd.DataFrame({'a': ['x', 'y']})
+        fileout = os.path.join(self.test_output_dir, 'unchanged.tex')
+
+        LatexPandas(df).gen_tex_table(fileout, 'test_table')
+        os.utime(fileout, ns=(0, 0))
+        LatexPandas(df).gen_tex_table(fileout, 'test_table')
+        assert os.stat(fileout).st_mtime_ns == 0
+
+        os.chmod(fileout, 0o640)
+        with mock.patch('os.umask') as umask:  # Process wide, not to be changed while other threads write
+            LatexPandas(df).gen_tex_table(fileout, 'other caption')
+        umask.assert_not_called()
+        assert os.stat(fileout).st_mtime_ns != 0
+        assert os.stat(fileout).st_mode & 0o777 == 0o640
+
+
+class TextWrap(TestLatex):
+    def test_wrap_text(self):
+        assert wrap_text('short', 10) == ('short',)
+        assert wrap_text('aaa bbb ccc ddd', 7) == ('aaa bbb', 'ccc ddd')
+        assert wrap_text('a verylongword b', 5) == ('a', 'verylongword', 'b')
+        assert wrap_text('one two\nthree four five', 10) == ('one two', 'three four', 'five')
+
+    def test_wrap_column(self):
+        col = pd.Series(['aaa bbb', 'x', 'aaa bbb'], index=[3, 4, 5])
+        wrapped = wrap_column(col, 4, formatter='|'.join)
+        assert wrapped.tolist() == ['aaa|bbb', 'x', 'aaa|bbb']
+        assert wrapped.index.tolist() == [3, 4, 5]
+
+    def test_column_widths(self):
+        df = pd.DataFrame({'a': ['one two & three'], 'b': ['one two & three\nfour']})
+        LP = LatexPandas(df, col_width={'a': 7, 'b': 20})
+        rendered = LP._render_frame(wrap=True)
+
+        assert rendered['a'][0] == '\\begin{tabular}[c]{@{}c@{}}one two\\\\\\& three\\end{tabular}'
+        assert rendered['b'][0] == '\\begin{tabular}[c]{@{}c@{}}one two \\& three\\\\four\\end{tabular}'
+
+
+class Templates(TestLatex):
+    def test_compile(self):
+        template = TableTemplate('$$5 ${caption}:$n_cols\n', 'end')
+        assert template.render(caption='a', n_cols=2) == ('$5 a:2\n', 'end')
+        self.assertRaises(ValueError, TableTemplate, 'cost $5', '')
+
+    def test_builtin_templates(self):
+        df = pd.DataFrame({'a': ['x & y', 'z'], 'b': [1, 2]})
+        fileout = os.path.join(self.test_output_dir, 'tabularx.tex')
+
+        LatexPandas(df).gen_tex_table(fileout, 'test_table', col_form='XX', template='tabularx', small=False)
+        with open(fileout) as f:
+            assert f.read().endswith('\\begin{table}[H]\n\\centering \n\\caption{test_table}\\label{tab:test_table} \n'
+                                     '\\begin{tabularx}{\\textwidth}{XX}\n\\toprule\na & b \\\\\n\\midrule\n'
+                                     'x \\& y & 1 \\\\\nz & 2 \\\\\n\\bottomrule\n\\end{tabularx}\n\\end{table}\n')
+
+        LatexPandas(df).gen_tex_table(fileout, 'test_table', header=False, template='booktabs')
+        with open(fileout) as f:
+            assert f.read().endswith('\\begin{tabular}{lccr}\n\\toprule\n\\midrule\n'
+                                     'x \\& y & 1 \\\\\nz & 2 \\\\\n\\bottomrule\n\\end{tabular}\n')
+
+    def test_user_template(self):
+        register_template('plain', TableTemplate('\\begin{tabular}{$col_form}\n${header}', '\\end{tabular}\n'))
+        fileout = os.path.join(self.test_output_dir, 'plain.tex')
+
+        LatexPandas(pd.DataFrame({'a': ['x']})).gen_tex_table(fileout, 'test_table', col_form='l', template='plain')
+        with open(fileout) as f:
+            assert f.read() == '\\begin{tabular}{l}\na \\\\\nx \\\\\n\\end{tabular}\n'
+
 
 class SheetsDataframe(TestLatex):
+    '''Tables of recorded sheet ranges, see the *_grid.json fixtures'''
+    def sheet_frames(self, name):
+        '''DataFrame and metadata of the GridData fixture of name, without header row'''
+        with open(os.path.join(os.path.dirname(__file__), 'data', name + '_grid.json')) as f:
+            grid = json.load(f)
+        G = GoogleSheets.__new__(GoogleSheets)  # Parsing needs no credentials
+        return G._table_frames(grid, header_row=False)
+
     def test_standard_table(self):
         name = 'AOCS N2 chart'
-        id = '1KW31J20B3s-nx_UxVzlym19yM6-gAFdctSvjBQq9yi8'
-        data_range = 'AOCS!A1:K11'
-
-        G = GoogleSheets(self.SCOPES, self.gen_api_creds)
-        df = G.get_spreadsheet(id, data_range, header_row=False, dev=False)[0]
+        df = self.sheet_frames('AOCS_N2_chart')[0]
 
         LP = LatexPandas(df, col_width=20)
 
-
         filename = os.path.join(self.test_output_dir, name.replace(' ', '_') + '.tex')
         LP.gen_tex_table(filename, name, col_form='c', header=False)
         LP.group_table_rows(filename)
@@ -66,22 +298,15 @@ class SheetsDataframe(TestLatex):
                            filename,
                            shallow=False)
 
-
-
     def test_gsheet_formatting(self):
         header = False
         small = True
 
-        id = '1KW31J20B3s-nx_UxVzlym19yM6-gAFdctSvjBQq9yi8'
         name = 'Formatted Sys N2 Chart'
-        data_range = 'Lander N2 Chart!B2:I9'
-
-        G = GoogleSheets(self.SCOPES, self.gen_api_creds)
-        df, formatting = G.get_spreadsheet(id, data_range, header_row=False)
+        df, formatting = self.sheet_frames('Formatted_Sys_N2_Chart')
 
         LP = LatexPandas(df, metadata=formatting)
 
-
         filename = os.path.join(self.test_output_dir, name.replace(' ', '_') + '.tex')
         LP.gen_tex_table(filename, name, header=header, longtable=True, small=small)
 
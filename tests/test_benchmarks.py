@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: test_benchmarks
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BENCH_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks',
+                            'bench_pipeline.py')
+
+
+class PipelineBenchmark(unittest.TestCase):
+    def test_smoke(self):
+        # Tiny run, only checks that the benchmarks still work and report all steps
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        subprocess.run([sys.executable, BENCH_SCRIPT, '--rows', '5', '--cols', '3', '--repeat', '1',
+                        '--output', output], capture_output=True, check=True)
+
+        with open(output) as f:
+            report = json.load(f)
+        os.remove(output)
+        os.rmdir(os.path.dirname(output))
+
+        assert report['params']['rows'] == 5
+        assert {'build_table', 'render_wrapped', 'gen_tex_table_v1', 'gen_tex_table_v2'} <= set(report['results'])
+        for result in report['results'].values():
+            assert result['min_s'] >= 0 and result['peak_bytes'] >= 0
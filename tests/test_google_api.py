@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: test_google_api
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import httplib2
+from googleapiclient import discovery
+from googleapiclient.errors import HttpError
+
+from LuigiPyTools import GoogleSheets, GoogleCalendar, LatexPandas, CellFormats
+from LuigiPyTools import google_api, metrics, transport
+from LuigiPyTools.cassette import Cassette
+from LuigiPyTools.sheet_cache import SheetCache
+
+
+class FakeCreds():
+    '''Stand-in for google.oauth2.credentials.Credentials'''
+    def __init__(self, valid=True):
+        self.valid = valid
+        self.expired = not valid
+        self.refresh_token = 'refresh'
+        self.refreshed = 0
+
+    def refresh(self, request):
+        self.refreshed += 1
+        self.valid = True
+        self.expired = False
+
+    def apply(self, headers):
+        headers['authorization'] = 'Bearer token'
+
+
+def grid_data(values, widths=None, fmt=None):
+    '''Synthetic GridData of a single range, as returned with includeGridData=True'''
+    widths = widths or [100] * max(len(row) for row in values)
+    fmt = fmt or {'backgroundColor': {'red': 1, 'green': 1, 'blue': 1}, 'horizontalAlignment': 'LEFT'}
+    return {'columnMetadata': [{'pixelSize': w} for w in widths],
+            'rowData': [{'values': [{'formattedValue': v, 'effectiveFormat': fmt} for v in row]}
+                        for row in values]}
+
+
+class OfflineService(unittest.TestCase):
+    '''Runs GoogleService subclasses without network or stored tokens'''
+    def setUp(self) -> None:
+        self.SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly',
+                       'https://www.googleapis.com/auth/calendar.readonly']
+        self.auth_dir = tempfile.mkdtemp()
+        self.creds_file = os.path.join(self.auth_dir, 'creds.json')
+        shutil.copy(os.path.join(os.path.dirname(__file__), 'py_general_creds.json'), self.creds_file)
+
+        self.creds = FakeCreds()
+        load_patch = mock.patch.object(google_api.GoogleService, '_load_credentials', autospec=True,
+                                       side_effect=self._fake_load)
+        build_patch = mock.patch.object(google_api, 'build', side_effect=lambda *a, **kw: mock.MagicMock())
+        self.load_mock = load_patch.start()
+        self.build_mock = build_patch.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _fake_load(self, service, creds=None):
+        if creds is not None and creds.expired:
+            creds.refresh(None)
+            return creds
+        return self.creds
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.auth_dir)
+        google_api._SHARED_CACHE.clear()
+
+
+class ServiceCache(OfflineService):
+    def test_service_reused(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        first = G._service_connect('sheets')
+        second = G._service_connect('sheets')
+
+        assert first is second
+        assert self.load_mock.call_count == 1
+        assert self.build_mock.call_count == 1
+
+    def test_refresh_on_expiry_only(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        service = G._service_connect('sheets')
+        self.creds.valid, self.creds.expired = False, True
+
+        assert G._service_connect('sheets') is service
+        assert self.creds.refreshed == 1
+        assert self.build_mock.call_count == 1
+
+    def test_invalidate_on_scope_change(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        first = G._service_connect('sheets')
+        G._scopes = self.SCOPES[:1]
+
+        assert G._service_connect('sheets') is not first
+        assert self.load_mock.call_count == 2
+
+    def test_invalidate_on_credentials_file_change(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        first = G._service_connect('sheets')
+        stat = os.stat(self.creds_file)
+        os.utime(self.creds_file, (stat.st_atime, stat.st_mtime + 10))
+
+        assert G._service_connect('sheets') is not first
+
+    def test_shared_cache(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir, share_cache=True)
+        C = GoogleCalendar(self.SCOPES, self.creds_file, auth_dir=self.auth_dir, share_cache=True)
+        G._service_connect('sheets')
+        C._service_connect('calendar')
+
+        assert self.load_mock.call_count == 1
+        assert C._service_connect('sheets') is G._service_connect('sheets')
+
+    def test_retrying_transport(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir, retries=3, rate_limit=10)
+        G._service_connect('sheets')
+        http = self.build_mock.call_args.kwargs['http']
+
+        assert isinstance(http, transport.RetryHttp)
+        assert http.http.credentials is self.creds
+        assert http.retries == 3 and http.rate_limiter.rate == 10
+
+
+class Transport(unittest.TestCase):
+    def setUp(self) -> None:
+        sleep_patch = mock.patch.object(transport.time, 'sleep')
+        self.sleep = sleep_patch.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_retry(self):
+        responses = [({'status': '429', 'retry-after': '7'}, b''), ({'status': '503'}, b''), ({'status': '200'}, b'ok')]
+        http = mock.Mock()
+        http.request.side_effect = [(mock.Mock(status=int(r['status']), **{'get.side_effect': r.get}), c)
+                                    for r, c in responses]
+
+        resp, content = transport.RetryHttp(http, retries=2).request('uri')
+
+        assert content == b'ok'
+        assert http.request.call_count == 3
+        assert self.sleep.call_args_list[0].args == (7.,)
+        assert self.sleep.call_args_list[1].args[0] <= 1.
+
+    def test_retries_exhausted(self):
+        http = mock.Mock()
+        http.request.side_effect = [(mock.Mock(status=500, **{'get.return_value': None}), b'')] * 2 + \
+                                   [ConnectionError()] * 2
+
+        resp, content = transport.RetryHttp(http, retries=1).request('uri')
+        assert resp.status == 500
+        with self.assertRaises(ConnectionError):
+            transport.RetryHttp(http, retries=1).request('uri')
+
+    def test_token_bucket(self):
+        bucket = transport.TokenBucket(rate=2, capacity=2)
+        delays = [bucket.reserve() for _ in range(4)]
+
+        assert delays[:2] == [0, 0]
+        assert 0.4 < delays[2] <= 0.5 and 0.9 < delays[3] <= 1.
+
+    def test_retry_after(self):
+        assert transport.retry_after('3') == 3
+        assert transport.retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+        assert transport.retry_after('soon') is None
+
+
+class BatchSheets(OfflineService):
+    def test_get_spreadsheets(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        service = G._service_connect('sheets')
+        responses = {
+            'id1': {'sheets': [{'properties': {'title': 'Sheet1'},
+                                'data': [grid_data([['a', 'b'], ['1', '2']]), grid_data([['x'], ['y']])]},
+                               {'properties': {'title': "Bob's sheet"},
+                                'data': [grid_data([['c'], ['3']])]}]},
+            'id2': {'sheets': [{'properties': {'title': 'Data'},
+                                'data': [grid_data([['d'], ['4']])]}]},
+        }
+        get = service.spreadsheets.return_value.get
+        get.side_effect = lambda spreadsheetId, **kw: mock.Mock(**{'execute.return_value': responses[spreadsheetId]})
+
+        tables = G.get_spreadsheets([('id1', 'Sheet1!A1:B2'), ('id2', 'Data!A1:A2'),
+                                     ('id1', "'Bob''s sheet'!A1:A2"), ('id1', 'C1:C2'),
+                                     ('id1', 'Sheet1!A1:B2')])
+
+        assert get.call_count == 2
+        assert get.call_args_list[0].kwargs['ranges'] == ['Sheet1!A1:B2', "'Bob''s sheet'!A1:A2", 'C1:C2']
+        assert [list(df.columns) for df, _ in tables] == [['a', 'b'], ['d'], ['c'], ['x'], ['a', 'b']]
+        assert tables[0][0].iloc[0].tolist() == ['1', '2']
+        assert tables[0][1]['col_widths'] == [100, 100]
+
+    def test_no_drive_request_without_cache(self):
+        G = GoogleSheets(self.SCOPES + ['https://www.googleapis.com/auth/drive.metadata.readonly'], self.creds_file,
+                         auth_dir=self.auth_dir)
+        G._service_connect('sheets').spreadsheets.return_value.get.return_value.execute.return_value = {
+            'sheets': [{'properties': {'title': 'Sheet1'}, 'data': [grid_data([['a'], ['1']])]}]}
+
+        G.get_spreadsheets([('id', 'Sheet1!A1:A2')])
+        assert not G._service_connect('drive').files.called
+
+    def test_whole_sheet_ranges(self):
+        # Sheet titles that are also valid cell references
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        resp = {'sheets': [{'properties': {'title': 'Sheet1'}, 'data': [grid_data([['a'], ['1']]), grid_data([['d']])]},
+                           {'properties': {'title': 'Sheet2'}, 'data': [grid_data([['b'], ['2']])]},
+                           {'properties': {'title': 'Budget2020'}, 'data': [grid_data([['c'], ['3']])]}]}
+
+        grids = G._match_ranges(resp, ['Sheet1!A1:A2', 'Sheet2', 'Budget2020', 'A1:A2'])
+        assert [grids[r]['rowData'][0]['values'][0]['formattedValue'] for r in grids] == ['a', 'b', 'c', 'd']
+
+    def test_masked_fetch(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        get = G._service_connect('sheets').spreadsheets.return_value.get
+        get.return_value.execute.return_value = {'sheets': [{'properties': {'title': 'Sheet1'},
+                                                             'data': [grid_data([['a'], ['1']])]}]}
+
+        df, metadata = G.get_spreadsheet('id1', 'Sheet1!A1:A2', fetch='masked')
+
+        assert get.call_args.kwargs['fields'] == GoogleSheets._GRID_FIELDS
+        assert df['a'].tolist() == ['1']
+
+    def test_values_fetch(self):
+        G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        values = G._service_connect('sheets').spreadsheets.return_value.values.return_value
+        values.get.return_value.execute.return_value = {'values': [['a', 'b'], ['1']]}
+        values.batchGet.return_value.execute.return_value = {'valueRanges': [{'values': [['x']]}, {}]}
+
+        df, metadata = G.get_spreadsheet('id1', 'A1:B2', fetch='values')
+        tables = G.get_spreadsheets([('id1', 'Named'), ('id1', 'B1:B2')], fetch='values', header_row=False)
+
+        assert metadata is None
+        assert df.iloc[0].tolist() == ['1', '']
+        assert tables[0][0].iloc[0].tolist() == ['x']
+        assert tables[1][0].empty
+        with self.assertRaises(ValueError):
+            G.get_spreadsheet('id1', 'A1:B2', fetch='formats')
+
+
+class BuildTable(OfflineService):
+    def setUp(self) -> None:
+        super().setUp()
+        self.G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        blue = {'backgroundColor': {'red': 0.5, 'green': 0.5, 'blue': 1}, 'horizontalAlignment': 'CENTER'}
+        white = {'backgroundColor': {'red': 1, 'green': 1, 'blue': 1}, 'horizontalAlignment': 'LEFT'}
+        self.grid = {'columnMetadata': [{'pixelSize': 100}, {'pixelSize': 300}],
+                     'rowData': [{'values': [{'formattedValue': 'a', 'effectiveFormat': dict(blue)},
+                                             {'formattedValue': 'b & c', 'effectiveFormat': dict(white)}]},
+                                 {},
+                                 {'values': [{'effectiveFormat': dict(white)}]}]}
+
+    def test_interned_formats(self):
+        data = self.G._build_table(self.grid)
+
+        assert data['values'] == [['a', '', ''], ['b & c', '', '']]
+        assert data['codes'].tolist() == [[1, 2], [0, 0], [2, 0]]
+        assert len(data['formats']) == 3
+        assert data['formats'][0] is GoogleSheets._DEFAULT_FMT
+
+    def test_latex_formatting(self):
+        df, metadata = self.G._table_frames(self.grid, header_row=False)
+        LP = LatexPandas(df, metadata=metadata)
+
+        assert LP._render_frame().iloc[0].tolist() == ['\\cellcolor{lpc0} a', 'b \\& c']
+        assert LP._tex_col_format_metadata(metadata).startswith('C{\\dimexpr 0.2500\\linewidth')
+
+    def test_cell_formats(self):
+        df, metadata = self.G._table_frames(self.grid, header_row=False)
+        formats = metadata['cell_formats']
+        LP = LatexPandas(df, metadata=formats)
+
+        assert formats.background.shape == (3, 3)
+        assert formats.cell_alignment().tolist() == [[2, 1], [0, 0], [1, 0]]
+        assert LP._render_frame().iloc[0, 0] == '\\cellcolor{lpc0} a'
+        assert LP._tex_col_format_metadata(formats).startswith('C{\\dimexpr 0.2500\\linewidth')
+
+        # Colour components equal to 0 are omitted by the API
+        red = CellFormats.from_formats([[0]], [{'backgroundColor': {'red': 1}, 'textFormat': {'bold': True}}])
+        assert red.background.tolist() == [[1, 0, 0]]
+        assert red.bold.tolist() == [True]
+
+    def test_color_definitions(self):
+        blue = {'backgroundColor': {'red': 0.5, 'green': 0.5, 'blue': 1}, 'horizontalAlignment': 'CENTER'}
+        blue_right = dict(blue, horizontalAlignment='RIGHT')  # Same colour, other format
+        white = {'backgroundColor': {'red': 1, 'green': 1, 'blue': 1}}
+        grid = {'columnMetadata': [{'pixelSize': 100}, {'pixelSize': 100}],
+                'rowData': [{'values': [{'formattedValue': v, 'effectiveFormat': fmt} for v, fmt in row]}
+                            for row in [[('a', blue), ('b', blue_right)], [('c', blue), ('d', white)],
+                                        [('e', white), ('f', white)]]]}
+        df, metadata = self.G._table_frames(grid, header_row=False)
+        LP = LatexPandas(df, metadata=metadata)
+
+        assert LP._render_frame().to_numpy().tolist() == [['\\rowcolor{lpc0} a', 'b'],
+                                                          ['\\cellcolor{lpc0} c', 'd'], ['e', 'f']]
+
+        fname = os.path.join(self.auth_dir, 'colors.tex')
+        LP.gen_tex_table(fname, 'table', header=False)
+        with open(fname) as f:
+            tex = f.read()
+        assert tex.count('\\definecolor') == 1 and '\\definecolor{lpc0}{rgb}{0.5,0.5,1}\n\\begin{small}' in tex
+
+    def test_streamed_latex(self):
+        df, metadata = self.G._table_frames(self.grid, header_row=False)
+        LP = LatexPandas(df, metadata=metadata)
+
+        whole = os.path.join(self.auth_dir, 'whole.tex')
+        streamed = os.path.join(self.auth_dir, 'streamed.tex')
+        LP.gen_tex_table(whole, 'table', header=False, group_rows=True)
+        LP.gen_tex_table(streamed, 'table', header=False, group_rows=True, chunksize=2)
+
+        with open(whole) as f1, open(streamed) as f2:
+            tex = f1.read()
+            assert tex.replace('whole.tex', 'streamed.tex') == f2.read()
+        body = tex.split('\\endlastfoot\n')[1].splitlines()
+        assert body[1:6:2] == ['\\addlinespace[\\tableskip]'] * 3 and body[6] == '\\end{longtable}'
+        assert '\\endhead\n\\midrule' in tex
+
+
+class FakeHttp():
+    '''Stand-in for httplib2.Http, answering every request with the same JSON'''
+    def __init__(self, data):
+        self.data = data
+        self.requests = []
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        self.requests.append(uri)
+        return httplib2.Response({'status': '200', 'content-type': 'application/json'}), json.dumps(self.data).encode()
+
+
+class Cassettes(OfflineService):
+    def setUp(self) -> None:
+        super().setUp()
+        self.build_mock.side_effect = discovery.build  # Static discovery documents, no network
+        self.cassette_dir = os.path.join(self.auth_dir, 'cassette')
+        self.fake_http = FakeHttp({'sheets': [{'properties': {'title': 'Sheet1'},
+                                               'data': [grid_data([['a', 'b'], ['1', '2']])]}]})
+
+    def sheets(self, cassette, **kwargs):
+        return GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir, cassette=cassette, **kwargs)
+
+    def test_record_replay(self):
+        with mock.patch('google_auth_httplib2.AuthorizedHttp', return_value=self.fake_http):
+            recorded, _ = self.sheets(Cassette(self.cassette_dir, mode='record')).get_spreadsheet('id', 'A1:B2')
+        assert len(os.listdir(self.cassette_dir)) == 1
+
+        mock.patch.stopall()  # Replay must not need stored credentials
+        G = self.sheets(Cassette(self.cassette_dir))
+        with mock.patch.object(google_api, 'build', side_effect=discovery.build):
+            replayed, _ = G.get_spreadsheet('id', 'A1:B2')
+
+        assert replayed.equals(recorded)
+        assert len(self.fake_http.requests) == 1
+        self.assertRaises(LookupError, G.get_spreadsheet, 'other', 'A1:B2')
+
+    def test_injected_errors(self):
+        with mock.patch('google_auth_httplib2.AuthorizedHttp', return_value=self.fake_http):
+            self.sheets(Cassette(self.cassette_dir, mode='record')).get_spreadsheet('id', 'A1:B2')
+
+        always = self.sheets(Cassette(self.cassette_dir, error_rate=1, error_status=429), retries=0)
+        with self.assertRaises(HttpError) as error:
+            always.get_spreadsheet('id', 'A1:B2')
+        assert error.exception.resp.status == 429
+
+        # Retried until a recorded response is served
+        with mock.patch.object(transport.time, 'sleep') as sleep:
+            df, _ = self.sheets(Cassette(self.cassette_dir, error_rate=0.5, seed=3), retries=10).get_spreadsheet(
+                'id', 'A1:B2')
+        assert df.columns.tolist() == ['a', 'b'] and sleep.called
+
+    def test_stage_metrics(self):
+        with mock.patch('google_auth_httplib2.AuthorizedHttp', return_value=self.fake_http):
+            with metrics.Profiler() as prof:
+                self.sheets(None).get_spreadsheet('id', 'A1:B2')
+
+        summary = prof.summary()
+        assert list(summary) == ['auth', 'connect', 'http', 'request', 'build_table', 'frames', 'get_spreadsheet']
+        assert summary['http']['bytes'] == len(json.dumps(self.fake_http.data)) and summary['http']['retries'] == 0
+        assert [event['status'] for event in prof.events if event['stage'] == 'http'] == [200]
+        assert 'status' not in summary['http']
+        assert summary['build_table']['cells'] == 4
+        assert summary['get_spreadsheet']['total_s'] >= summary['request']['total_s'] >= summary['http']['total_s']
+
+
+class CachedSheets(OfflineService):
+    def setUp(self) -> None:
+        super().setUp()
+        self.SCOPES = self.SCOPES + ['https://www.googleapis.com/auth/drive.metadata.readonly']
+        self.cache_dir = os.path.join(self.auth_dir, 'cache')
+        self.G = GoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir, cache_dir=self.cache_dir)
+        self.get = self.G._service_connect('sheets').spreadsheets.return_value.get
+        self.get.return_value.execute.return_value = {'sheets': [{'properties': {'title': 'Sheet1'},
+                                                                  'data': [grid_data([['a'], ['1']])]}]}
+        self.files_get = self.G._service_connect('drive').files.return_value.get
+        self.files_get.return_value.execute.return_value = {'modifiedTime': '2020-06-07T10:00:00Z'}
+
+    def test_revision_validation(self):
+        first = self.G.get_spreadsheet('id1', 'Sheet1!A1:A2')
+        second = self.G.get_spreadsheet('id1', 'Sheet1!A1:A2')
+        assert self.get.call_count == 1
+        assert second[0].equals(first[0])
+
+        self.files_get.return_value.execute.return_value = {'modifiedTime': '2020-06-08T10:00:00Z'}
+        self.G.get_spreadsheets([('id1', 'Sheet1!A1:A2'), ('id1', 'Sheet1!A1:A2')])
+        assert self.get.call_count == 2
+        assert self.get.call_args.kwargs['ranges'] == ['Sheet1!A1:A2']
+
+        self.G.get_spreadsheets([('id1', 'Sheet1!A1:A2')])
+        assert self.get.call_count == 2
+        assert self.files_get.call_count == 4
+
+    def test_ttl(self):
+        self.G._cache_ttl = 60
+        self.G.get_spreadsheet('id1', 'Sheet1!A1:A2', fetch='masked')
+        self.G.get_spreadsheet('id1', 'Sheet1!A1:A2', fetch='masked')
+        assert self.get.call_count == 1
+        assert self.files_get.call_count == 1
+
+    def test_lru_eviction(self):
+        cache = SheetCache(self.cache_dir, max_bytes=2000)
+        for i in range(3):
+            cache.put(('id', i), 'x' * 500)
+            os.utime(cache._path(('id', i)), (i, i))
+        cache.load(('id', 0))
+        cache.put(('id', 3), 'x' * 500)
+
+        assert [cache.header(('id', i)) is not None for i in range(4)] == [True, False, True, True]
+
+
+class CalendarEvents(OfflineService):
+    def test_pagination(self):
+        C = GoogleCalendar(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        pages = {None: {'items': [{'id': 1, 'start': {'dateTime': 'a'}}], 'nextPageToken': 'p2'},
+                 'p2': {'items': [{'id': 2, 'start': {'dateTime': 'b'}}]}}
+        list_events = C._service_connect('calendar').events.return_value.list
+        list_events.side_effect = lambda pageToken, **kw: mock.Mock(**{'execute.return_value': pages[pageToken]})
+
+        events = C.iter_calendar_events(start='2020', max_results=1, fields='id,start')
+        assert next(events)['id'] == 1
+        assert list_events.call_count == 1
+        assert [e['id'] for e in events] == [2]
+
+        assert list_events.call_args.kwargs['maxResults'] == 1
+        assert list_events.call_args.kwargs['fields'] == 'nextPageToken,items(id,start)'
+        assert C.get_calendar_events_df(start='2020').columns.tolist() == ['id', 'start.dateTime']
+
+    def test_incremental_sync(self):
+        C = GoogleCalendar(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        list_events = C._service_connect('calendar').events.return_value.list
+
+        def event(id, day, status='confirmed'):
+            return {'id': id, 'status': status, 'start': {'dateTime': f'2020-06-0{day}T10:00:00+02:00'},
+                    'end': {'date': f'2020-06-0{day + 1}'}}
+
+        def respond(pages):
+            def list_page(pageToken, **kw):
+                return mock.Mock(**{'execute.return_value': pages[pageToken]})
+            list_events.side_effect = list_page
+
+        respond({None: {'items': [event('a', 2)], 'nextPageToken': 'p2'},
+                 'p2': {'items': [event('b', 1)], 'nextSyncToken': 's1'}})
+        assert C.sync_calendar() == 2
+        assert [e['id'] for e in C.get_calendar_events(start='2020-01-01T00:00:00Z', sync=True)] == ['b', 'a']
+        assert C.store.sync_token('primary') == 's1'
+
+        respond({None: {'items': [event('b', 1, 'cancelled'), event('c', 4)], 'nextSyncToken': 's2'}})
+        events = C.get_calendar_events(start='2020-06-02T12:00:00Z', end='2020-06-05T00:00:00Z', sync=True)
+        assert [e['id'] for e in events] == ['a', 'c']
+        assert list_events.call_args.kwargs['syncToken'] == 's1'
+
+        gone = HttpError(mock.Mock(status=410), b'')
+        full = {None: {'items': [event('d', 3)], 'nextSyncToken': 's3'}}
+        list_events.side_effect = [gone, mock.Mock(**{'execute.return_value': full[None]})]
+        C.sync_calendar()
+        assert [e['id'] for e in C.store.events('primary')] == ['d']
+        assert C.store.sync_token('primary') == 's3'
+
+    def test_multiple_calendars(self):
+        C = GoogleCalendar(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        calendars = {'a': [{'id': 1, 'start': {'dateTime': '2020-06-01T12:00:00+02:00'}},
+                           {'id': 2, 'start': {'date': '2020-06-03'}}],
+                     'b': [{'id': 3, 'start': {'dateTime': '2020-06-01T11:00:00Z'}}]}
+
+        def get_events(cal_id, start, end, **kwargs):
+            if cal_id not in calendars:
+                raise KeyError(cal_id)
+            return [dict(event) for event in calendars[cal_id]]
+
+        with mock.patch.object(C, 'get_calendar_events', side_effect=get_events):
+            events, errors = C.get_events_for_calendars({'A': 'a', 'B': 'b', 'X': 'x'}, max_workers=2)
+
+        assert [(e['calendarId'], e['id']) for e in events] == [('a', 1), ('b', 3), ('a', 2)]
+        assert list(errors) == ['x']
+
+    def test_service_per_thread(self):
+        C = GoogleCalendar(self.SCOPES, self.creds_file, auth_dir=self.auth_dir)
+        main_service = C._service_connect('calendar')
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            thread_service = pool.submit(C._service_connect, 'calendar').result()
+
+        assert thread_service is not main_service
+        assert self.load_mock.call_count == 1
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: test_google_async
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+
+import asyncio
+import unittest
+
+from LuigiPyTools import google_async
+from test_google_api import OfflineService, grid_data
+
+if google_async.aiohttp is not None:
+    from aiohttp import web
+
+
+@unittest.skipIf(google_async.aiohttp is None, 'aiohttp not installed')
+class FakeApiServer(OfflineService, unittest.IsolatedAsyncioTestCase):
+    '''Serves canned Sheets and Calendar API responses on localhost'''
+    async def asyncSetUp(self) -> None:
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+        app = web.Application()
+        app.router.add_get('/sheets/spreadsheets/{id}', self.spreadsheet)
+        app.router.add_get('/calendar/calendars/{cal_id}/events', self.events)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.api_urls = {'sheets': f'http://127.0.0.1:{port}/sheets/',
+                         'calendar': f'http://127.0.0.1:{port}/calendar/'}
+
+    async def asyncTearDown(self) -> None:
+        await self.runner.cleanup()
+
+    async def spreadsheet(self, request):
+        self.requests.append(request)
+        ranges = request.query.getall('ranges')
+        data = [grid_data([[request.match_info['id'] + r]]) for r in ranges]
+        return web.json_response({'sheets': [{'properties': {'title': 'Sheet1'}, 'data': data}]})
+
+    async def events(self, request):
+        self.requests.append(request)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+
+        cal_id = request.match_info['cal_id']
+        if cal_id == 'missing':
+            return web.json_response({}, status=404)
+        page = request.query.get('pageToken')
+        resp = {'items': [{'id': f'{cal_id}{page}', 'start': {'dateTime': f'2020-06-0{1 if page else 2}T10:00:00Z'}}]}
+        if page is None:
+            resp['nextPageToken'] = '2'
+        return web.json_response(resp)
+
+
+class AsyncClients(FakeApiServer):
+    async def test_get_spreadsheets(self):
+        async with google_async.AsyncGoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir,
+                                                  api_urls=self.api_urls) as G:
+            tables = await G.get_spreadsheets([('a', 'Sheet1!A1'), ('b', 'Sheet1!A1'), ('a', 'Sheet1!B2')],
+                                              header_row=False, fetch='masked')
+            df, metadata = await G.get_spreadsheet('c', 'A1')
+
+        assert [t[0].iloc[0, 0] for t in tables] == ['aSheet1!A1', 'bSheet1!A1', 'aSheet1!B2']
+        assert list(df.columns) == ['cA1']
+        assert self.requests[0].query['includeGridData'] == 'true'
+        assert self.requests[0].headers['authorization'] == 'Bearer token'
+
+    async def test_no_table_cache(self):
+        with self.assertRaises(ValueError):
+            google_async.AsyncGoogleSheets(self.SCOPES, self.creds_file, auth_dir=self.auth_dir,
+                                           cache_dir=self.auth_dir)
+
+    async def test_calendar_events(self):
+        async with google_async.AsyncGoogleCalendar(self.SCOPES, self.creds_file, auth_dir=self.auth_dir,
+                                                    api_urls=self.api_urls, max_concurrency=2) as C:
+            events = await C.get_calendar_events('cal', start='2020-01-01T00:00:00Z')
+            merged, errors = await C.get_events_for_calendars(['x', 'y', 'z', 'missing'],
+                                                              start='2020-01-01T00:00:00Z')
+
+        assert [e['id'] for e in events] == ['calNone', 'cal2']
+        assert [e['id'] for e in merged] == ['x2', 'y2', 'z2', 'xNone', 'yNone', 'zNone']
+        assert list(errors) == ['missing']
+        assert self.max_active <= 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: test_imports
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+# Modules that are slow to import, and only needed once the Google APIs are used
+HEAVY_MODULES = ['LuigiPyTools.google_api', 'googleapiclient.discovery', 'google_auth_oauthlib',
+                 'google.auth.transport.requests', 'httplib2', 'aiohttp']
+
+
+def loaded_modules(code):
+    '''Heavy modules loaded by running code in a fresh interpreter'''
+    check = code + '\nimport sys\nprint(" ".join(m for m in %r if m in sys.modules))' % HEAVY_MODULES
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, '-c', check], cwd=root, capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+class LazyImports(unittest.TestCase):
+    def test_package_import(self):
+        assert loaded_modules('import LuigiPyTools') == []
+
+    def test_latex_only(self):
+        assert loaded_modules('from LuigiPyTools import LatexPandas, CellFormats') == []
+
+    def test_google_api_deferred(self):
+        # The api clients themselves are imported once a service is built
+        assert loaded_modules('from LuigiPyTools import GoogleSheets') == ['LuigiPyTools.google_api']
+
+    def test_public_names(self):
+        import LuigiPyTools
+        for name in LuigiPyTools.__all__:
+            assert getattr(LuigiPyTools, name).__name__ == name
+        self.assertRaises(AttributeError, getattr, LuigiPyTools, 'missing')
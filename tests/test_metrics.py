@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: test_metrics
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from LuigiPyTools import LatexPandas, metrics
+
+
+class Stages(unittest.TestCase):
+    def test_disabled(self):
+        assert not metrics.enabled()
+        with metrics.stage('render', rows=3) as info:
+            info['cells'] = 9
+        assert info == {}
+
+    def test_hooks(self):
+        events = []
+        metrics.add_hook(events.append)
+        try:
+            assert metrics.enabled()
+            with metrics.stage('render', rows=3) as info:
+                info['cells'] = 9
+            metrics.emit('sheet_cache', hits=1, misses=0)
+            with self.assertRaises(KeyError):
+                with metrics.stage('http'):
+                    raise KeyError('uri')
+        finally:
+            metrics.remove_hook(events.append)
+        assert not metrics.enabled()
+
+        assert [event['stage'] for event in events] == ['render', 'sheet_cache', 'http']
+        assert events[0]['rows'] == 3 and events[0]['cells'] == 9 and events[0]['duration_s'] >= 0
+        assert 'duration_s' not in events[1]
+        assert events[2]['error'] == 'KeyError'
+
+    def test_profiler(self):
+        with metrics.Profiler() as prof:
+            for n in (2, 3):
+                with metrics.stage('render', rows=n, wrap=True, file='t.tex'):
+                    pass
+            metrics.emit('sheet_cache', hits=0, misses=1)
+        metrics.emit('sheet_cache', hits=1, misses=0)  # After the profiler exited
+
+        summary = prof.summary()
+        assert summary['render']['count'] == 2 and summary['render']['rows'] == 5 and summary['render']['wrap'] == 2
+        assert summary['render']['mean_s'] == summary['render']['total_s'] / 2
+        assert 'file' not in summary['render']
+        assert summary['sheet_cache'] == {'count': 1, 'hits': 0, 'misses': 1}
+
+        report = prof.report().splitlines()
+        assert len(report) == 3 and report[1].startswith('render')
+
+
+class LatexStages(unittest.TestCase):
+    def test_gen_tex_table(self):
+        df = pd.DataFrame({'a': ['x & y'] * 5, 'b': [1.5] * 5})
+        fname = os.path.join(tempfile.mkdtemp(), 'table.tex')
+        reports = []
+
+        with metrics.profile(output=reports.append) as prof:
+            LatexPandas(df).gen_tex_table(fname, 'Metrics', chunksize=2, incremental=True)
+            LatexPandas(df).gen_tex_table(fname, 'Metrics', chunksize=2, incremental=True)
+        os.remove(fname)
+        os.rmdir(os.path.dirname(fname))
+
+        summary = prof.summary()
+        assert summary['gen_tex_table']['count'] == 2 and summary['gen_tex_table']['skipped'] == 1
+        assert summary['gen_tex_table']['rows'] == 5 and summary['gen_tex_table']['cells'] == 10
+        assert summary['render']['count'] == 3 and summary['render']['cells'] == 10
+        assert summary['write']['rows'] == 5
+        assert reports == [prof.report()]
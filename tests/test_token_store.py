@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+title: test_token_store
+project: LuigiPyTools
+date: 10/18/2026
+author: lmaio
+"""
+
+import json
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+from google.oauth2.credentials import Credentials
+
+from LuigiPyTools import GoogleSheets, token_store
+from LuigiPyTools.token_store import TokenStore
+
+CLIENT_ID = json.load(open(os.path.join(os.path.dirname(__file__), 'py_general_creds.json')))['installed']['client_id']
+READONLY = ['https://www.googleapis.com/auth/spreadsheets.readonly']
+
+
+def make_creds(expires_in=3600, client_id=CLIENT_ID, scopes=None):
+    '''Credentials expiring in expires_in seconds'''
+    return Credentials('token', refresh_token='refresh', token_uri='https://oauth2.googleapis.com/token',
+                       client_id=client_id, client_secret='secret', scopes=scopes,
+                       expiry=datetime.utcnow() + timedelta(seconds=expires_in))
+
+
+def fake_refresh(creds, request):
+    '''Slow stand-in for Credentials.refresh, logging each call to the refresh log'''
+    with open(os.environ['TOKEN_REFRESH_LOG'], 'a') as f:
+        f.write('refresh\n')
+    time.sleep(0.2)
+    creds.token = 'refreshed'
+    creds.expiry = datetime.utcnow() + timedelta(hours=1)
+
+
+def process_credentials(path):
+    token_store._STORES.clear()  # Forked from the test process, start without its memory cache
+    return TokenStore.open(path).credentials(None, client_id=CLIENT_ID).token
+
+
+class TokenStores(unittest.TestCase):
+    def setUp(self) -> None:
+        self.auth_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.auth_dir, 'token.json')
+        self.refresh_log = os.path.join(self.auth_dir, 'refreshes.log')
+
+        env_patch = mock.patch.dict(os.environ, {'TOKEN_REFRESH_LOG': self.refresh_log})
+        refresh_patch = mock.patch.object(Credentials, 'refresh', autospec=True, side_effect=fake_refresh)
+        env_patch.start()
+        refresh_patch.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.auth_dir)
+        token_store._STORES.clear()
+
+    def refreshes(self):
+        if not os.path.exists(self.refresh_log):
+            return 0
+        with open(self.refresh_log) as f:
+            return len(f.readlines())
+
+    def test_json_roundtrip(self):
+        store = TokenStore.open(self.path)
+        store.save(make_creds())
+
+        with open(self.path) as f:
+            assert json.load(f)['refresh_token'] == 'refresh'
+        assert os.stat(self.path).st_mode & 0o077 == 0
+        assert store.load(CLIENT_ID).valid
+        assert store.load('other client') is None
+        assert TokenStore.open(os.path.relpath(self.path)) is store
+
+    def test_memory_cache(self):
+        store = TokenStore.open(self.path)
+        store.save(make_creds())
+        creds = store.credentials(None)
+
+        with mock.patch.object(store, 'load') as load:
+            assert store.credentials(None, client_id=CLIENT_ID) is creds
+        assert not load.called
+
+    def test_coalesced_refresh(self):
+        TokenStore(self.path).save(make_creds(expires_in=-60))
+        store = TokenStore.open(self.path)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = list(pool.map(lambda _: store.credentials(None, client_id=CLIENT_ID).token, range(8)))
+        assert tokens == ['refreshed'] * 8
+        assert self.refreshes() == 1
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'Refresh patch is inherited by forked processes only')
+    def test_coalesced_refresh_processes(self):
+        TokenStore(self.path).save(make_creds(expires_in=-60))
+
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            tokens = pool.map(process_credentials, [self.path] * 4)
+        assert tokens == ['refreshed'] * 4
+        assert self.refreshes() == 1
+
+    def test_authorize(self):
+        authorize = mock.Mock(return_value=make_creds())
+        creds = TokenStore.open(self.path).credentials(authorize, client_id=CLIENT_ID)
+
+        assert authorize.call_count == 1 and creds.valid
+        assert TokenStore(self.path).load(CLIENT_ID).token == 'token'
+
+    def test_scope_change(self):
+        TokenStore(self.path).save(make_creds(scopes=READONLY))
+        store = TokenStore.open(self.path)
+        assert store.credentials(None, client_id=CLIENT_ID, scopes=READONLY).token == 'token'
+
+        scopes = ['https://www.googleapis.com/auth/spreadsheets']
+        authorized = make_creds(scopes=scopes)
+        authorized.token = 'authorized'
+        authorize = mock.Mock(return_value=authorized)
+        creds = store.credentials(authorize, client_id=CLIENT_ID, scopes=scopes)
+        assert authorize.call_count == 1 and creds.token == 'authorized'
+        assert TokenStore(self.path).load(CLIENT_ID, scopes).token == 'authorized'
+
+        # Expired tokens of fewer scopes are authorized again, not refreshed
+        TokenStore(self.path).save(make_creds(expires_in=-60, scopes=READONLY))
+        store.clear()
+        assert store.credentials(authorize, client_id=CLIENT_ID, scopes=scopes).token == 'authorized'
+        assert authorize.call_count == 2 and self.refreshes() == 0
+
+    def test_legacy_pickle(self):
+        legacy_path = os.path.join(self.auth_dir, 'token.pickle')
+        with open(legacy_path, 'wb') as f:
+            pickle.dump(make_creds(), f)
+
+        creds = TokenStore.open(self.path, legacy_path).credentials(None, client_id=CLIENT_ID)
+        assert creds.token == 'token'
+        assert os.path.exists(self.path) and not os.path.exists(legacy_path)
+
+    def test_google_service(self):
+        TokenStore(self.path).save(make_creds(scopes=READONLY))
+        shutil.copy(os.path.join(os.path.dirname(__file__), 'py_general_creds.json'), self.auth_dir)
+
+        G = GoogleSheets(READONLY, os.path.join(self.auth_dir, 'py_general_creds.json'), auth_dir=self.auth_dir)
+        assert G._credentials().token == 'token'